@@ -0,0 +1,30 @@
+"""message history index
+
+Revision ID: 20261017093000_5b7c1e2d9f3a
+Revises: 20250310201406_97a740b07a50
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017093000_5b7c1e2d9f3a"
+down_revision: Union[str, None] = "20250310201406_97a740b07a50"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_messages_conversation_status_created_at",
+        "messages",
+        ["conversation_id", "status", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_messages_conversation_status_created_at", table_name="messages")
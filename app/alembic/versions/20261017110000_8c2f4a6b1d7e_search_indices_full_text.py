@@ -0,0 +1,112 @@
+"""search indices full text
+
+Revision ID: 20261017110000_8c2f4a6b1d7e
+Revises: 20261017093000_5b7c1e2d9f3a
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017110000_8c2f4a6b1d7e"
+down_revision: Union[str, None] = "20261017093000_5b7c1e2d9f3a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows updated per transaction while existing rows are backfilled
+BACKFILL_BATCH_SIZE = 10000
+
+
+def search_vector_expression(row: str = "") -> str:
+    # Names and paths are split on every non-alphanumeric character, so each part
+    # of foo/bar_baz.py is a lexeme. Content is capped, a tsvector is limited to 1MB.
+    # Colons are escaped, the expression is run as a text() statement.
+    return (
+        f"setweight(to_tsvector('simple', regexp_replace(coalesce({row}name, ''), "
+        "'[^[\\:alnum\\:]]+', ' ', 'g')), 'A') || "
+        f"setweight(to_tsvector('simple', regexp_replace(coalesce({row}file_path, ''), "
+        "'[^[\\:alnum\\:]]+', ' ', 'g')), 'B') || "
+        f"setweight(to_tsvector('simple', left(coalesce({row}content, ''), 100000)), 'C')"
+    )
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # A nullable column without default is added without rewriting the table,
+    # a trigger fills it for new and changed rows
+    op.add_column(
+        "search_indices",
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True),
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION search_indices_search_vector_update()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {search_vector_expression("NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER search_indices_search_vector
+        BEFORE INSERT OR UPDATE OF name, file_path, content ON search_indices
+        FOR EACH ROW EXECUTE PROCEDURE search_indices_search_vector_update()
+        """
+    )
+
+    # Existing rows are backfilled and indexed outside of the migration's
+    # transaction, so no lock is held on search_indices for longer than a batch
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT max(id) FROM search_indices")).scalar()
+        # Only the constant search vector expression is interpolated
+        backfill = sa.text(
+            "UPDATE search_indices "  # nosec B608
+            f"SET search_vector = {search_vector_expression()} "
+            "WHERE id >= :start AND id < :end AND search_vector IS NULL"
+        )
+        for start in range(0, (max_id or 0) + 1, BACKFILL_BATCH_SIZE):
+            bind.execute(backfill, {"start": start, "end": start + BACKFILL_BATCH_SIZE})
+
+        op.create_index(
+            "idx_search_indices_search_vector",
+            "search_indices",
+            ["search_vector"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "idx_search_indices_name_trgm",
+            "search_indices",
+            ["name"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "idx_search_indices_name_trgm",
+            table_name="search_indices",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "idx_search_indices_search_vector",
+            table_name="search_indices",
+            postgresql_concurrently=True,
+        )
+    op.execute("DROP TRIGGER IF EXISTS search_indices_search_vector ON search_indices")
+    op.execute("DROP FUNCTION IF EXISTS search_indices_search_vector_update()")
+    op.drop_column("search_indices", "search_vector")
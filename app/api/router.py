@@ -3,9 +3,10 @@ from typing import List, Optional
 
 from fastapi import Depends, Header, HTTPException
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.modules.auth.api_key_service import APIKeyService
 from app.modules.conversations.conversation.conversation_controller import (
     ConversationController,
@@ -62,6 +63,7 @@ async def get_api_key_user(
 async def create_conversation(
     conversation: SimpleConversationRequest,
     db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_db),
     user=Depends(get_api_key_user),
 ):
     user_id = user["user_id"]
@@ -74,7 +76,7 @@ async def create_conversation(
         agent_ids=conversation.agent_ids,
     )
 
-    controller = ConversationController(db, user_id, None)
+    controller = ConversationController(db, user_id, None, async_db)
     return await controller.create_conversation(full_request)
 
 
@@ -101,6 +103,7 @@ async def post_message(
     conversation_id: str,
     message: MessageRequest,
     db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_db),
     user=Depends(get_api_key_user),
 ):
     if message.content == "" or message.content is None or message.content.isspace():
@@ -108,7 +111,7 @@ async def post_message(
 
     user_id = user["user_id"]
     # Note: email is no longer available with API key auth
-    controller = ConversationController(db, user_id, None)
+    controller = ConversationController(db, user_id, None, async_db)
     message_stream = controller.post_message(conversation_id, message, stream=False)
     async for chunk in message_stream:
         return chunk
@@ -119,6 +122,7 @@ async def create_conversation_and_message(
     project_id: str,
     message: DirectMessageRequest,
     db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_db),
     user=Depends(get_api_key_user),
 ):
     if message.content == "" or message.content is None or message.content.isspace():
@@ -130,7 +134,7 @@ async def create_conversation_and_message(
     if message.agent_id is None:
         message.agent_id = "codebase_qna_agent"
 
-    controller = ConversationController(db, user_id, None)
+    controller = ConversationController(db, user_id, None, async_db)
     res = await controller.create_conversation(
         CreateConversationRequest(
             user_id=user_id,
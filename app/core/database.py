@@ -2,6 +2,8 @@ import os
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -21,6 +23,45 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url():
+    """
+    POSTGRES_SERVER for asyncpg, with the libpq query arguments it accepts
+    under other names moved to connect arguments. Any other libpq-only
+    argument is rejected by asyncpg when connecting.
+    """
+    url = make_url(os.getenv("POSTGRES_SERVER")).set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    connect_args = {}
+    if "sslmode" in query:
+        connect_args["ssl"] = query.pop("sslmode")
+    if "connect_timeout" in query:
+        connect_args["timeout"] = float(query.pop("connect_timeout"))
+    return url.set(query=query), connect_args
+
+
+async_database_url, async_connect_args = get_async_database_url()
+
+# Async engine on the same database through asyncpg, for request handlers that
+# must not block the event loop while other responses are streaming. Each
+# worker process holds up to pool_size + max_overflow connections here on top
+# of the 20 of the sync engine, size both against max_connections.
+async_engine = create_async_engine(
+    async_database_url,
+    connect_args=async_connect_args,
+    pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", 5)),
+    max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 5)),
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    echo=False,
+)
+
+# Loaded objects stay usable after commit, async sessions cannot lazy load
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+)
+
 # Base class for all ORM models
 Base = declarative_base()
 
@@ -32,3 +73,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async session dependency, for routes served through the async services
+async def get_async_db():
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from neo4j import Driver, GraphDatabase
+
+from app.core.config_provider import config_provider
+
+logger = logging.getLogger(__name__)
+
+# Pool settings shared by every driver of the process
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", 50))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(
+    os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", 60)
+)
+# Idle connections older than this are checked with a round-trip before reuse
+NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT", 30))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", 1800))
+
+_drivers: Dict[Tuple[str, str], Tuple[int, Driver]] = {}
+_lock = threading.Lock()
+
+
+def get_neo4j_driver(
+    uri: Optional[str] = None,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+) -> Driver:
+    """
+    Return the process-wide driver for a Neo4j server, creating it on first use.
+
+    Defaults to the configured server. Drivers are owned by this module, callers
+    must not close them. A forked worker gets its own drivers, pools are never
+    shared across processes.
+    """
+    if uri is None:
+        neo4j_config = config_provider.get_neo4j_config()
+        uri = neo4j_config["uri"]
+        username = neo4j_config["username"]
+        password = neo4j_config["password"]
+
+    key = (uri, username)
+    pid = os.getpid()
+    with _lock:
+        cached = _drivers.get(key)
+        if cached and cached[0] == pid:
+            return cached[1]
+
+        driver = GraphDatabase.driver(
+            uri,
+            auth=(username, password),
+            max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+            connection_acquisition_timeout=NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+            liveness_check_timeout=NEO4J_LIVENESS_CHECK_TIMEOUT,
+            max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME,
+        )
+        _drivers[key] = (pid, driver)
+        logger.info(
+            f"Created Neo4j driver for {uri} with pool size {NEO4J_MAX_POOL_SIZE}"
+        )
+        return driver
+
+
+def close_neo4j_drivers():
+    with _lock:
+        for pid, driver in _drivers.values():
+            if pid == os.getpid():
+                driver.close()
+        _drivers.clear()
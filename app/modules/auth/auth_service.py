@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 
@@ -7,8 +8,13 @@ from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from firebase_admin import auth
 
+from app.modules.auth.token_cache import FirebaseKeyRefresher, VerifiedTokenCache
+
 load_dotenv(override=True)
 
+# Verified tokens of this process, a repeated token skips signature checks
+verified_tokens = VerifiedTokenCache()
+
 
 class AuthService:
     def login(self, email, password):
@@ -60,15 +66,22 @@ class AuthService:
                     detail="Bearer authentication is needed",
                     headers={"WWW-Authenticate": 'Bearer realm="auth_required"'},
                 )
-            try:
-                decoded_token = auth.verify_id_token(credential.credentials)
-                request.state.user = decoded_token
-            except Exception as err:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Invalid authentication from Firebase. {err}",
-                    headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
-                )
+            decoded_token = verified_tokens.get(credential.credentials)
+            if decoded_token is None:
+                FirebaseKeyRefresher.ensure_started()
+                try:
+                    # Off the event loop, a certificate fetch can block
+                    decoded_token = await asyncio.to_thread(
+                        auth.verify_id_token, credential.credentials
+                    )
+                except Exception as err:
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail=f"Invalid authentication from Firebase. {err}",
+                        headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+                    )
+                verified_tokens.set(credential.credentials, decoded_token)
+            request.state.user = decoded_token
             res.headers["WWW-Authenticate"] = 'Bearer realm="auth_required"'
             return decoded_token
 
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import firebase_admin
+from firebase_admin import auth
+
+logger = logging.getLogger(__name__)
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+# How often the Firebase signing certificates are fetched ahead of requests
+AUTH_KEYS_REFRESH_SECONDS = float(os.getenv("AUTH_KEYS_REFRESH_SECONDS", 1800))
+
+# Public URL of the Firebase signing certificates, not a credential
+ID_TOKEN_CERT_URI = (  # nosec B105
+    "https://www.googleapis.com/robot/v1/metadata/x509/"
+    "securetoken@system.gserviceaccount.com"
+)
+
+# firebase_admin release whose internals FirebaseKeyRefresher is written
+# against, keep in step with the pin in requirements.txt
+FIREBASE_ADMIN_TESTED_VERSION = "6.6.0"
+
+
+class VerifiedTokenCache:
+    """
+    Decoded Firebase ID tokens, keyed by the hash of the token.
+
+    An entry is kept until the token's exp claim and the least recently used
+    entries are evicted beyond AUTH_TOKEN_CACHE_SIZE, so a repeated token is
+    authenticated with a dictionary lookup instead of a signature check.
+    Tokens are not checked for revocation either way.
+    """
+
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        key = self.hash_token(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, decoded_token = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers may annotate the claims, the cached ones stay untouched
+        return dict(decoded_token)
+
+    def set(self, token: str, decoded_token: Dict):
+        expires_at = decoded_token.get("exp")
+        if not expires_at or time.time() >= expires_at:
+            return
+        key = self.hash_token(token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), dict(decoded_token))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class FirebaseKeyRefresher:
+    """
+    Keeps the certificates used to verify ID tokens fresh in the background.
+
+    firebase_admin caches the certificates by their Cache-Control headers and
+    fetches them again on the request that finds them stale. Fetching them
+    through its own certificate request every AUTH_KEYS_REFRESH_SECONDS keeps
+    that fetch off the request path. This relies on firebase_admin internals,
+    so it only runs on FIREBASE_ADMIN_TESTED_VERSION and warns otherwise.
+    """
+
+    _thread: Optional[threading.Thread] = None
+    _thread_pid: Optional[int] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def ensure_started(cls):
+        if cls._thread_pid == os.getpid():
+            return
+        with cls._lock:
+            if cls._thread_pid == os.getpid():
+                return
+            cls._thread_pid = os.getpid()
+            if firebase_admin.__version__ != FIREBASE_ADMIN_TESTED_VERSION:
+                logger.warning(
+                    f"Firebase key refresh disabled, firebase_admin "
+                    f"{firebase_admin.__version__} is not the tested "
+                    f"{FIREBASE_ADMIN_TESTED_VERSION}"
+                )
+                return
+            cls._thread = threading.Thread(
+                target=cls._run, name="firebase-key-refresher", daemon=True
+            )
+            cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            if not cls._refresh():
+                return
+            time.sleep(AUTH_KEYS_REFRESH_SECONDS)
+
+    @staticmethod
+    def _refresh() -> bool:
+        try:
+            request = auth._get_client(firebase_admin.get_app())._token_verifier.request
+        except Exception as e:
+            logger.warning(f"Firebase key refresh unavailable: {e}")
+            return False
+        try:
+            request(ID_TOKEN_CERT_URI, method="GET")
+        except Exception as e:
+            logger.warning(f"Firebase key refresh failed: {e}")
+        return True
@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from app.modules.utils.cache_tiers import (
+    DiskTier,
+    RedisTier,
+    decode_entry,
+    encode_entry,
+)
+
+logger = logging.getLogger(__name__)
+
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Size the disk tier is trimmed back to, least recently used entries first
+BLOB_CACHE_DISK_MAX_BYTES = int(
+    os.getenv("BLOB_CACHE_DISK_MAX_BYTES", 10 * 1024 * 1024 * 1024)
+)
+BLOB_CACHE_TTL = int(os.getenv("BLOB_CACHE_TTL", 24 * 3600))
+# Bump when the format of cached lines changes
+BLOB_CACHE_VERSION = 2
+
+
+class BlobCache:
+    """
+    Decoded file contents keyed by (repository, commit sha, path), as lines
+    that keep their line endings.
+
+    A file never changes at a given commit, so entries need no invalidation.
+    Lookups go through a per-process LRU, then Redis, then an optional disk
+    tier enabled by BLOB_CACHE_DIR and bounded by BLOB_CACHE_DISK_MAX_BYTES.
+    Hits are promoted to the faster tiers.
+    """
+
+    # Shared by every BlobCache of the process, bounded by the size of the lines
+    _memory: "OrderedDict[str, List[str]]" = OrderedDict()
+    _memory_bytes = 0
+    _lock = threading.Lock()
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.redis = RedisTier("Blob", BLOB_CACHE_TTL)
+        self.disk = DiskTier(
+            "Blob", cache_dir or os.getenv("BLOB_CACHE_DIR"), BLOB_CACHE_DISK_MAX_BYTES
+        )
+        self.cache_dir = self.disk.cache_dir
+
+    @staticmethod
+    def make_key(repo_name: str, commit_id: str, file_path: str) -> str:
+        return f"blob:v{BLOB_CACHE_VERSION}:{repo_name}:{commit_id}:{file_path}"
+
+    def get_lines(
+        self, repo_name: str, commit_id: str, file_path: str
+    ) -> Optional[List[str]]:
+        key = self.make_key(repo_name, commit_id, file_path)
+
+        with self._lock:
+            lines = self._memory.get(key)
+            if lines is not None:
+                self._memory.move_to_end(key)
+                return lines
+
+        payload = self.redis.get(key)
+        if payload is None:
+            payload = self.disk.read(key)
+            if payload is not None:
+                self.redis.set_many({key: payload})
+
+        if payload is None:
+            return None
+
+        lines = decode_entry(payload, "blob")
+        if lines is not None:
+            self._remember(key, lines)
+        return lines
+
+    def set_lines(
+        self, repo_name: str, commit_id: str, file_path: str, lines: List[str]
+    ):
+        key = self.make_key(repo_name, commit_id, file_path)
+        self._remember(key, lines)
+        payload = encode_entry(lines)
+        self.redis.set_many({key: payload})
+        self.disk.write(key, payload)
+
+    def store_snapshot(
+        self, repo_name: str, commit_id: str, files: Iterable[Tuple[str, str]]
+    ) -> int:
+        """
+        Persist (path, text) pairs of a checkout to the disk tier.
+
+        Used at parse time, before the snapshot is deleted, so later reads of the
+        same commit do not go back to the provider. Memory and Redis are only
+        filled when an entry is read.
+        """
+        if not self.cache_dir:
+            return 0
+        count = 0
+        for file_path, text in files:
+            key = self.make_key(repo_name, commit_id, file_path)
+            self.disk.write(key, encode_entry(text.splitlines(keepends=True)))
+            count += 1
+        return count
+
+    @classmethod
+    def _remember(cls, key: str, lines: List[str]):
+        size = sum(len(line) for line in lines)
+        if size > BLOB_CACHE_MAX_BYTES:
+            return
+        with cls._lock:
+            previous = cls._memory.pop(key, None)
+            if previous is not None:
+                cls._memory_bytes -= sum(len(line) for line in previous)
+            cls._memory[key] = lines
+            cls._memory_bytes += size
+            while cls._memory_bytes > BLOB_CACHE_MAX_BYTES:
+                _, evicted = cls._memory.popitem(last=False)
+                cls._memory_bytes -= sum(len(line) for line in evicted)
@@ -1,14 +1,17 @@
 import os
-from typing import Optional
+from typing import List, Optional
 
+from app.modules.code_provider.blob_cache import BlobCache
 from app.modules.code_provider.github.github_service import GithubService
 from app.modules.code_provider.local_repo.local_repo_service import LocalRepoService
+from app.modules.projects.projects_service import ProjectService
 
 
 class CodeProviderService:
     def __init__(self, sql_db):
         self.sql_db = sql_db
         self.service_instance = self._get_service_instance()
+        self.blob_cache = BlobCache()
 
     def _get_service_instance(self):
         if os.getenv("isDevelopmentMode") == "enabled":
@@ -25,6 +28,30 @@ class CodeProviderService:
     def get_file_content(
         self, repo_name, file_path, start_line, end_line, branch_name, project_id
     ):
-        return self.service_instance.get_file_content(
-            repo_name, file_path, start_line, end_line, branch_name, project_id
-        )
+        project = ProjectService(self.sql_db).get_project_from_db_by_id_sync(project_id)
+        commit_id = project.get("commit_id") if project else None
+        if not commit_id:
+            return self.service_instance.get_file_content(
+                repo_name, file_path, start_line, end_line, branch_name, project_id
+            )
+
+        # Whole files are cached per commit, line ranges are sliced locally
+        lines = self.blob_cache.get_lines(repo_name, commit_id, file_path)
+        if lines is None:
+            # Read at the parsed commit so the content matches the graph's lines
+            content = self.service_instance.get_file_content(
+                repo_name, file_path, 0, 0, commit_id, project_id
+            )
+            lines = content.splitlines(keepends=True)
+            self.blob_cache.set_lines(repo_name, commit_id, file_path, lines)
+
+        return self.select_lines(lines, start_line, end_line)
+
+    @staticmethod
+    def select_lines(lines: List[str], start_line: int, end_line: int) -> str:
+        # Lines keep their endings, so whole files come back byte for byte
+        if (start_line == end_line == 0) or (start_line is None and end_line is None):
+            return "".join(lines)
+        # added -2 to start and end line to include the function definition/ decorator line
+        start = start_line - 2 if start_line - 2 > 0 else 0
+        return "\n".join("".join(lines[start:end_line]).splitlines())
@@ -2,8 +2,9 @@ import asyncio
 import logging
 import os
 import re
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import git
 from fastapi import HTTPException
@@ -15,6 +16,12 @@ logger = logging.getLogger(__name__)
 
 
 class LocalRepoService:
+    # Repo objects are kept per path so their `git cat-file --batch` process
+    # stays alive between reads. GitPython's object reader is not thread-safe,
+    # so each repository has a lock around it.
+    _repos: Dict[str, Tuple[git.Repo, threading.Lock]] = {}
+    _repos_lock = threading.Lock()
+
     def __init__(self, db: Session):
         self.db = db
         self.project_manager = ProjectService(db)
@@ -30,6 +37,25 @@ class LocalRepoService:
             )
         return git.Repo(repo_path)
 
+    def _get_cached_repo(self, repo_path: str) -> Tuple[git.Repo, threading.Lock]:
+        with self._repos_lock:
+            cached = self._repos.get(repo_path)
+            if cached is None:
+                cached = (self.get_repo(repo_path), threading.Lock())
+                self._repos[repo_path] = cached
+            return cached
+
+    def read_blob(self, repo_path: str, ref: str, file_path: str) -> str:
+        """
+        Read a file at a branch, tag or commit straight from the git object
+        database, without checking out the working tree.
+        """
+        repo, lock = self._get_cached_repo(repo_path)
+        with lock:
+            blob = repo.commit(ref).tree / file_path
+            data = blob.data_stream.read()
+        return data.decode("utf-8")
+
     def get_file_content(
         self,
         repo_name: str,
@@ -52,16 +78,14 @@ class LocalRepoService:
                     status_code=400, detail="Project has no associated local repository"
                 )
 
-            repo = self.get_repo(repo_path)
-            repo.git.checkout(branch_name)
-            file_full_path = os.path.join(repo_path, file_path)
-            with open(file_full_path, "r", encoding="utf-8") as file:
-                lines = file.readlines()
-                if (start_line == end_line == 0) or (start_line == end_line == None):
-                    return "".join(lines)
-                start = start_line - 2 if start_line - 2 > 0 else 0
-                selected_lines = lines[start:end_line]
-                return "".join(selected_lines)
+            lines = self.read_blob(repo_path, branch_name, file_path).splitlines(
+                keepends=True
+            )
+            if (start_line == end_line == 0) or (start_line == end_line == None):
+                return "".join(lines)
+            start = start_line - 2 if start_line - 2 > 0 else 0
+            selected_lines = lines[start:end_line]
+            return "".join(selected_lines)
         except Exception as e:
             logger.error(
                 f"Error processing file content for project ID {project_id}, file {file_path}: {e}",
@@ -229,7 +253,6 @@ class LocalRepoService:
     def get_local_repo_diff(self, repo_path: str, branch_name: str) -> Dict[str, str]:
         try:
             repo = self.get_repo(repo_path)
-            repo.git.checkout(branch_name)
 
             # Determine the default branch name
             default_branch_name = repo.git.symbolic_ref(
@@ -1,6 +1,7 @@
-from typing import AsyncGenerator, List
+from typing import AsyncGenerator, List, Optional
 
 from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.modules.conversations.conversation.conversation_schema import (
@@ -8,6 +9,7 @@ from app.modules.conversations.conversation.conversation_schema import (
     ConversationInfoResponse,
     CreateConversationRequest,
     CreateConversationResponse,
+    StreamCheckpointResponse,
 )
 from app.modules.conversations.conversation.conversation_service import (
     AccessTypeNotFoundError,
@@ -25,9 +27,15 @@ from app.modules.conversations.message.message_schema import (
 
 
 class ConversationController:
-    def __init__(self, db: Session, user_id: str, user_email: str):
+    def __init__(
+        self,
+        db: Session,
+        user_id: str,
+        user_email: str,
+        async_db: Optional[AsyncSession] = None,
+    ):
         self.user_email = user_email
-        self.service = ConversationService.create(db, user_id, user_email)
+        self.service = ConversationService.create(db, user_id, user_email, async_db)
         self.user_id = user_id
 
     async def create_conversation(
@@ -81,6 +89,18 @@ class ConversationController:
         except ConversationServiceError as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    async def get_stream_checkpoint(
+        self, conversation_id: str
+    ) -> Optional[StreamCheckpointResponse]:
+        try:
+            return await self.service.get_stream_checkpoint(
+                conversation_id, self.user_id
+            )
+        except AccessTypeNotFoundError as e:
+            raise HTTPException(status_code=401, detail=str(e))
+        except ConversationServiceError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
     async def post_message(
         self, conversation_id: str, message: MessageRequest, stream: bool = True
     ) -> AsyncGenerator[ChatMessageResponse, None]:
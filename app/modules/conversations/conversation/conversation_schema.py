@@ -57,6 +57,15 @@ class ChatMessageResponse(BaseModel):
     tool_calls: List[Any]
 
 
+class StreamCheckpointResponse(BaseModel):
+    conversation_id: str
+    # "streaming" with the reply so far, or "completed" with the stored message
+    status: str
+    content: Optional[str] = None
+    citations: Optional[List[str]] = None
+    message_id: Optional[str] = None
+
+
 # Resolve forward references
 ConversationInfoResponse.update_forward_refs()
 
@@ -1,10 +1,12 @@
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timezone
-from typing import AsyncGenerator, List
-from sqlalchemy import func
+from typing import AsyncGenerator, List, Optional
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from uuid6 import uuid7
 
@@ -19,6 +21,7 @@ from app.modules.conversations.conversation.conversation_schema import (
     ConversationAccessType,
     ConversationInfoResponse,
     CreateConversationRequest,
+    StreamCheckpointResponse,
 )
 from app.modules.conversations.message.message_model import (
     Message,
@@ -40,7 +43,7 @@ from app.modules.intelligence.provider.provider_service import (
     ProviderService,
 )
 from app.modules.projects.projects_service import ProjectService
-from app.modules.users.user_service import UserService
+from app.modules.users.user_model import User
 from app.modules.utils.posthog_helper import PostHogClient
 from app.modules.intelligence.agents.chat_agents.adaptive_agent import (
     PromptService,
@@ -49,6 +52,9 @@ from app.modules.intelligence.tools.tool_service import ToolService
 
 logger = logging.getLogger(__name__)
 
+# Number of most recent messages passed to agents as chat history
+HISTORY_WINDOW = 8
+
 
 class ConversationServiceError(Exception):
     pass
@@ -83,8 +89,11 @@ class ConversationService:
         promt_service: PromptService,
         agent_service: AgentsService,
         custom_agent_service: CustomAgentService,
+        async_db: Optional[AsyncSession] = None,
     ):
         self.sql_db = db
+        # Queries on the message path go through the async session when given
+        self.async_db = async_db
         self.user_id = user_id
         self.user_email = user_email
         self.project_service = project_service
@@ -94,18 +103,27 @@ class ConversationService:
         self.prompt_service = promt_service
         self.agent_service = agent_service
         self.custom_agent_service = custom_agent_service
+        # Start of the request, for the time to first token
+        self.created_at = time.monotonic()
 
     @classmethod
-    def create(cls, db: Session, user_id: str, user_email: str):
-        project_service = ProjectService(db)
-        history_manager = ChatHistoryService(db)
+    def create(
+        cls,
+        db: Session,
+        user_id: str,
+        user_email: str,
+        async_db: Optional[AsyncSession] = None,
+    ):
+        project_service = ProjectService(db, async_db)
+        history_manager = ChatHistoryService(db, async_db)
         provider_service = ProviderService(db, user_id)
-        tool_service = ToolService(db, user_id)
+        # Tools are built lazily, only those used by the selected agent
+        tool_service = ToolService(db, user_id, provider_service)
         prompt_service = PromptService(db)
+        custom_agent_service = CustomAgentService(db, tool_service)
         agent_service = AgentsService(
-            db, provider_service, prompt_service, tool_service
+            db, provider_service, prompt_service, tool_service, custom_agent_service
         )
-        custom_agent_service = CustomAgentService(db)
         return cls(
             db,
             user_id,
@@ -117,20 +135,29 @@ class ConversationService:
             prompt_service,
             agent_service,
             custom_agent_service,
+            async_db,
         )
 
+    async def _execute(self, statement):
+        if self.async_db is not None:
+            return await self.async_db.execute(statement)
+        return self.sql_db.execute(statement)
+
     async def check_conversation_access(
         self, conversation_id: str, user_email: str
     ) -> str:
         if not user_email:
             return ConversationAccessType.WRITE
-        user_service = UserService(self.sql_db)
-        user_id = user_service.get_user_id_by_email(user_email)
+        user_id = (
+            await self._execute(select(User.uid).where(User.email == user_email))
+        ).scalar()
 
         # Retrieve the conversation
         conversation = (
-            self.sql_db.query(Conversation).filter_by(id=conversation_id).first()
-        )
+            await self._execute(
+                select(Conversation).where(Conversation.id == conversation_id)
+            )
+        ).scalar()
         if not conversation:
             return (
                 ConversationAccessType.NOT_FOUND
@@ -146,10 +173,18 @@ class ConversationService:
             return ConversationAccessType.WRITE  # Creator can write
         # Check if the conversation is shared
         if conversation.shared_with_emails:
-            shared_user_ids = user_service.get_user_ids_by_emails(
-                conversation.shared_with_emails
+            shared_user_ids = (
+                (
+                    await self._execute(
+                        select(User.uid).where(
+                            User.email.in_(conversation.shared_with_emails)
+                        )
+                    )
+                )
+                .scalars()
+                .all()
             )
-            if shared_user_ids is None:
+            if not shared_user_ids:
                 return ConversationAccessType.NOT_FOUND
             # Check if the current user ID is in the shared user IDs
             if user_id in shared_user_ids:
@@ -232,7 +267,7 @@ class ConversationService:
             self.history_manager.add_message_chunk(
                 conversation_id, content, MessageType.SYSTEM_GENERATED, user_id
             )
-            self.history_manager.flush_message_buffer(
+            await self.history_manager.flush_message_buffer(
                 conversation_id, MessageType.SYSTEM_GENERATED, user_id
             )
             logger.info(
@@ -261,10 +296,13 @@ class ConversationService:
             )
             if access_level == ConversationAccessType.READ:
                 raise AccessTypeReadError("Access denied.")
+            if message_type == MessageType.HUMAN:
+                # Keep the previous reply's text if its worker died mid-stream
+                await self.history_manager.recover_stream_checkpoint(conversation_id)
             self.history_manager.add_message_chunk(
                 conversation_id, message.content, message_type, user_id
             )
-            self.history_manager.flush_message_buffer(
+            await self.history_manager.flush_message_buffer(
                 conversation_id, message_type, user_id
             )
             logger.info(f"Stored message in conversation {conversation_id}")
@@ -326,17 +364,18 @@ class ConversationService:
         self, conversation_id: str
     ) -> Conversation:
         result = (
-            self.sql_db.query(
-                Conversation,
-                func.count(Message.id)
-                .filter(Message.type == MessageType.HUMAN)
-                .label("human_message_count"),
-            )
-            .outerjoin(Message, Conversation.id == Message.conversation_id)
-            .filter(Conversation.id == conversation_id)
-            .group_by(Conversation.id)
-            .first()
-        )
+            await self._execute(
+                select(
+                    Conversation,
+                    func.count(Message.id)
+                    .filter(Message.type == MessageType.HUMAN)
+                    .label("human_message_count"),
+                )
+                .outerjoin(Message, Conversation.id == Message.conversation_id)
+                .where(Conversation.id == conversation_id)
+                .group_by(Conversation.id)
+            )
+        ).first()
 
         if result:
             conversation, human_message_count = result
@@ -457,6 +496,7 @@ class ConversationService:
                 {Message.status: MessageStatus.ARCHIVED}, synchronize_session="fetch"
             )
             self.sql_db.commit()
+            ChatHistoryService.invalidate_history(conversation_id)
             logger.info(
                 f"Archived subsequent messages in conversation {conversation_id}"
             )
@@ -494,8 +534,10 @@ class ConversationService:
         node_ids: List[NodeContext],
     ) -> AsyncGenerator[ChatMessageResponse, None]:
         conversation = (
-            self.sql_db.query(Conversation).filter_by(id=conversation_id).first()
-        )
+            await self._execute(
+                select(Conversation).where(Conversation.id == conversation_id)
+            )
+        ).scalar()
         if not conversation:
             raise ConversationNotFoundError(
                 f"Conversation with id {conversation_id} not found"
@@ -505,7 +547,9 @@ class ConversationService:
         project_id = conversation.project_ids[0] if conversation.project_ids else None
 
         try:
-            history = self.history_manager.get_session_history(user_id, conversation_id)
+            history = await self.history_manager.get_session_history(
+                user_id, conversation_id, limit=HISTORY_WINDOW
+            )
             validated_history = [
                 (str(msg.content) if msg.content else msg) for msg in history
             ]
@@ -533,6 +577,11 @@ class ConversationService:
                         agent_id, user_id, query, node_ids, project_id, conversation.id
                     )
                 )
+                logger.info(
+                    f"Time to first token for conversation {conversation_id} "
+                    f"with custom agent {agent_id}: "
+                    f"{time.monotonic() - self.created_at:.2f} seconds"
+                )
                 yield ChatMessageResponse(
                     message=response["message"], citations=[], tool_calls=[]
                 )
@@ -542,13 +591,21 @@ class ConversationService:
                         project_id=str(project_id),
                         project_name=project_name,
                         curr_agent_id=str(agent_id),
-                        history=validated_history[-8:],
+                        history=validated_history[-HISTORY_WINDOW:],
                         node_ids=[node.node_id for node in node_ids],
                         query=query,
                     )
                 )
 
+                first_token = True
                 async for chunk in res:
+                    if first_token:
+                        first_token = False
+                        logger.info(
+                            f"Time to first token for conversation {conversation_id} "
+                            f"with agent {agent_id}: "
+                            f"{time.monotonic() - self.created_at:.2f} seconds"
+                        )
                     self.history_manager.add_message_chunk(
                         conversation_id,
                         chunk.response,
@@ -563,7 +620,7 @@ class ConversationService:
                             for tool_call in chunk.tool_calls
                         ],
                     )
-                self.history_manager.flush_message_buffer(
+                await self.history_manager.flush_message_buffer(
                     conversation_id, MessageType.AI_GENERATED
                 )
 
@@ -608,6 +665,7 @@ class ConversationService:
 
             # If we get here, commit the transaction
             self.sql_db.commit()
+            ChatHistoryService.invalidate_history(conversation_id)
 
             PostHogClient().send_event(
                 user_id,
@@ -704,21 +762,30 @@ class ConversationService:
             if access_level == ConversationAccessType.NOT_FOUND:
                 raise AccessTypeNotFoundError("Access denied.")
             conversation = (
-                self.sql_db.query(Conversation).filter_by(id=conversation_id).first()
-            )
+                await self._execute(
+                    select(Conversation.id).where(Conversation.id == conversation_id)
+                )
+            ).scalar()
             if not conversation:
                 raise ConversationNotFoundError(
                     f"Conversation with id {conversation_id} not found"
                 )
 
             messages = (
-                self.sql_db.query(Message)
-                .filter_by(conversation_id=conversation_id)
-                .filter_by(status=MessageStatus.ACTIVE)
-                .filter(Message.type != MessageType.SYSTEM_GENERATED)
-                .order_by(Message.created_at)
-                .offset(start)
-                .limit(limit)
+                (
+                    await self._execute(
+                        select(Message)
+                        .where(
+                            Message.conversation_id == conversation_id,
+                            Message.status == MessageStatus.ACTIVE,
+                            Message.type != MessageType.SYSTEM_GENERATED,
+                        )
+                        .order_by(Message.created_at)
+                        .offset(start)
+                        .limit(limit)
+                    )
+                )
+                .scalars()
                 .all()
             )
 
@@ -748,6 +815,25 @@ class ConversationService:
                 f"Failed to get messages for conversation {conversation_id}"
             ) from e
 
+    async def get_stream_checkpoint(
+        self, conversation_id: str, user_id: str
+    ) -> Optional[StreamCheckpointResponse]:
+        access_level = await self.check_conversation_access(
+            conversation_id, self.user_email
+        )
+        if access_level == ConversationAccessType.NOT_FOUND:
+            raise AccessTypeNotFoundError("Access denied.")
+        checkpoint = self.history_manager.get_stream_checkpoint(conversation_id)
+        if checkpoint is None:
+            return None
+        return StreamCheckpointResponse(
+            conversation_id=conversation_id,
+            status=checkpoint["status"],
+            content=checkpoint.get("content"),
+            citations=checkpoint.get("citations"),
+            message_id=checkpoint.get("message_id"),
+        )
+
     async def stop_generation(self, conversation_id: str, user_id: str) -> dict:
         logger.info(f"Attempting to stop generation for conversation {conversation_id}")
         return {"status": "success", "message": "Generation stop request received"}
@@ -1,11 +1,12 @@
 import json
-from typing import Any, AsyncGenerator, List
+from typing import Any, AsyncGenerator, Callable, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_async_db, get_db
 from app.modules.auth.auth_service import AuthService
 from app.modules.conversations.access.access_schema import (
     RemoveAccessRequest,
@@ -25,6 +26,7 @@ from .conversation.conversation_schema import (
     CreateConversationRequest,
     CreateConversationResponse,
     RenameConversationRequest,
+    StreamCheckpointResponse,
 )
 from .message.message_schema import MessageRequest, MessageResponse, RegenerateRequest
 
@@ -36,17 +38,32 @@ async def get_stream(data_stream: AsyncGenerator[Any, None]):
         yield json.dumps(chunk.dict())
 
 
+async def get_controller_stream(
+    db: Session,
+    user_id: str,
+    user_email: str,
+    open_stream: Callable[[ConversationController], AsyncGenerator[Any, None]],
+):
+    # Dependencies are closed before a streaming body runs, so the stream
+    # opens its own async session and holds it until the last chunk
+    async with AsyncSessionLocal() as async_db:
+        controller = ConversationController(db, user_id, user_email, async_db)
+        async for chunk in get_stream(open_stream(controller)):
+            yield chunk
+
+
 class ConversationAPI:
     @staticmethod
     @router.post("/conversations/", response_model=CreateConversationResponse)
     async def create_conversation(
         conversation: CreateConversationRequest,
         db: Session = Depends(get_db),
+        async_db: AsyncSession = Depends(get_async_db),
         user=Depends(AuthService.check_auth),
     ):
         user_id = user["user_id"]
         user_email = user["email"]
-        controller = ConversationController(db, user_id, user_email)
+        controller = ConversationController(db, user_id, user_email, async_db)
         return await controller.create_conversation(conversation)
 
     @staticmethod
@@ -57,11 +74,12 @@ class ConversationAPI:
     async def get_conversation_info(
         conversation_id: str,
         db: Session = Depends(get_db),
+        async_db: AsyncSession = Depends(get_async_db),
         user=Depends(AuthService.check_auth),
     ):
         user_id = user["user_id"]
         user_email = user["email"]
-        controller = ConversationController(db, user_id, user_email)
+        controller = ConversationController(db, user_id, user_email, async_db)
         return await controller.get_conversation_info(conversation_id)
 
     @staticmethod
@@ -74,13 +92,30 @@ class ConversationAPI:
         start: int = Query(0, ge=0),
         limit: int = Query(10, ge=1),
         db: Session = Depends(get_db),
+        async_db: AsyncSession = Depends(get_async_db),
         user=Depends(AuthService.check_auth),
     ):
         user_id = user["user_id"]
         user_email = user["email"]
-        controller = ConversationController(db, user_id, user_email)
+        controller = ConversationController(db, user_id, user_email, async_db)
         return await controller.get_conversation_messages(conversation_id, start, limit)
 
+    @staticmethod
+    @router.get(
+        "/conversations/{conversation_id}/stream-checkpoint/",
+        response_model=Optional[StreamCheckpointResponse],
+    )
+    async def get_stream_checkpoint(
+        conversation_id: str,
+        db: Session = Depends(get_db),
+        async_db: AsyncSession = Depends(get_async_db),
+        user=Depends(AuthService.check_auth),
+    ):
+        user_id = user["user_id"]
+        user_email = user["email"]
+        controller = ConversationController(db, user_id, user_email, async_db)
+        return await controller.get_stream_checkpoint(conversation_id)
+
     @staticmethod
     @router.post("/conversations/{conversation_id}/message/")
     async def post_message(
@@ -101,16 +136,27 @@ class ConversationAPI:
 
         user_id = user["user_id"]
         user_email = user["email"]
-        controller = ConversationController(db, user_id, user_email)
-        message_stream = controller.post_message(conversation_id, message, stream)
         if stream:
             return StreamingResponse(
-                get_stream(message_stream), media_type="text/event-stream"
+                get_controller_stream(
+                    db,
+                    user_id,
+                    user_email,
+                    lambda controller: controller.post_message(
+                        conversation_id, message, stream
+                    ),
+                ),
+                media_type="text/event-stream",
             )
         else:
-            # TODO: fix this, add types. In below stream we have only one output.
-            async for chunk in message_stream:
-                return chunk
+            async with AsyncSessionLocal() as async_db:
+                controller = ConversationController(db, user_id, user_email, async_db)
+                message_stream = controller.post_message(
+                    conversation_id, message, stream
+                )
+                # TODO: fix this, add types. In below stream we have only one output.
+                async for chunk in message_stream:
+                    return chunk
 
     @staticmethod
     @router.post(
@@ -125,17 +171,26 @@ class ConversationAPI:
     ):
         user_id = user["user_id"]
         user_email = user["email"]
-        controller = ConversationController(db, user_id, user_email)
-        message_stream = controller.regenerate_last_message(
-            conversation_id, request.node_ids, stream
-        )
         if stream:
             return StreamingResponse(
-                get_stream(message_stream), media_type="text/event-stream"
+                get_controller_stream(
+                    db,
+                    user_id,
+                    user_email,
+                    lambda controller: controller.regenerate_last_message(
+                        conversation_id, request.node_ids, stream
+                    ),
+                ),
+                media_type="text/event-stream",
             )
         else:
-            async for chunk in message_stream:
-                return chunk
+            async with AsyncSessionLocal() as async_db:
+                controller = ConversationController(db, user_id, user_email, async_db)
+                message_stream = controller.regenerate_last_message(
+                    conversation_id, request.node_ids, stream
+                )
+                async for chunk in message_stream:
+                    return chunk
 
     @staticmethod
     @router.delete("/conversations/{conversation_id}/", response_model=dict)
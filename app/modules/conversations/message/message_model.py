@@ -2,7 +2,7 @@ import enum
 
 from sqlalchemy import TIMESTAMP, CheckConstraint, Column
 from sqlalchemy import Enum as SQLAEnum
-from sqlalchemy import ForeignKey, String, Text, func
+from sqlalchemy import ForeignKey, Index, String, Text, func
 from sqlalchemy.orm import relationship
 
 from app.core.base_model import Base
@@ -47,4 +47,10 @@ class Message(Base):
             "(type IN ('AI_GENERATED', 'SYSTEM_GENERATED') AND sender_id IS NULL)",
             name="check_sender_id_for_type",
         ),
+        Index(
+            "idx_messages_conversation_status_created_at",
+            "conversation_id",
+            "status",
+            "created_at",
+        ),
     )
@@ -12,6 +12,7 @@ from app.modules.conversations.message.message_model import (
     MessageStatus,
     MessageType,
 )
+from app.modules.intelligence.memory.chat_history_service import ChatHistoryService
 
 logger = logging.getLogger(__name__)
 
@@ -125,6 +126,7 @@ class MessageService:
             if message:
                 message.status = MessageStatus.ARCHIVED
                 self.db.commit()
+                ChatHistoryService.invalidate_history(message.conversation_id)
             else:
                 raise MessageNotFoundError(f"Message with id {message_id} not found.")
         except SQLAlchemyError:
@@ -49,15 +49,16 @@ class AgentsService:
         llm_provider: ProviderService,
         prompt_provider: PromptService,
         tools_provider: ToolService,
+        custom_agent_service: Optional[CustomAgentService] = None,
     ):
         self.project_path = os.getenv("PROJECT_PATH", "projects/")
         self.db = db
-        self.prompt_service = PromptService(db)
+        self.prompt_service = prompt_provider
         self.system_agents = self._system_agents(
             llm_provider, prompt_provider, tools_provider
         )
         self.supervisor_agent = SupervisorAgent(llm_provider, self.system_agents)
-        self.custom_agent_service = CustomAgentService(self.db)
+        self.custom_agent_service = custom_agent_service or CustomAgentService(self.db)
 
     def _system_agents(
         self,
@@ -33,9 +33,11 @@ logger = setup_logger(__name__)
 
 
 class CustomAgentService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, tool_service: Optional[ToolService] = None):
         self.db = db
         self.secret_manager = SecretManager()
+        # Tools of the request, shared with the agents it runs
+        self.tool_service = tool_service
 
     async def _get_agent_by_id_and_user(
         self, agent_id: str, user_id: str
@@ -644,7 +646,7 @@ class CustomAgentService:
             "system_prompt": agent_model.system_prompt,
             "tasks": agent_model.tasks,
         }
-        runtime_agent = RuntimeAgent(self.db, agent_config)
+        runtime_agent = RuntimeAgent(self.db, agent_config, self.tool_service)
         try:
             result = await runtime_agent.run(
                 agent_id, query, project_id, conversation_id, node_ids
@@ -8,10 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.modules.conversations.message.message_model import MessageType
 from app.modules.intelligence.memory.chat_history_service import ChatHistoryService
-from app.modules.intelligence.provider.provider_service import (
-    AgentProvider,
-    ProviderService,
-)
+from app.modules.intelligence.provider.provider_service import AgentProvider
 from app.modules.intelligence.tools.tool_service import ToolService
 from app.modules.utils.logger import setup_logger
 
@@ -60,8 +57,14 @@ class RuntimeAgent:
         self,
         db: Session,
         agent_config: Dict[str, Any],
+        tool_service: Optional[ToolService] = None,
     ):
-        """Initialize the agent with configuration and tools"""
+        """
+        Initialize the agent with configuration and tools.
+
+        The request's ToolService is reused when given, along with its
+        ProviderService, and only the tools named by the agent's tasks are built.
+        """
         self.config = AgentConfig(**agent_config)
         self.db = db
         self.max_iter = int(os.getenv("MAX_ITER", "5"))
@@ -73,17 +76,16 @@ class RuntimeAgent:
         self.history_manager = ChatHistoryService(self.db)
         self.project_id = None
         self.agent = None
-        self.llm = ProviderService(self.db, self.user_id).get_llm(
+        self.tool_service = tool_service or ToolService(db, self.user_id)
+        self.llm = self.tool_service.provider_service.get_llm(
             AgentProvider.CREWAI, config_type="chat"
         )
-        # Initialize tools
-        self.tool_service = ToolService(db, self.user_id)
         self.tools = {}
-        for tool_id, tool in self.get_available_tools().items():
-            tool = self.tool_service.tools[tool_id]
-
-            if tool:
-                self.tools[tool_id] = tool
+        for task_config in self.config.tasks:
+            for tool_name in task_config.tools:
+                tool = self.tool_service.get_tool(tool_name)
+                if tool is not None:
+                    self.tools[tool_name] = tool
 
     def get_available_tools(self) -> List[str]:
         """Get list of available tools from tool service"""
@@ -227,7 +229,7 @@ class RuntimeAgent:
                 content,
                 MessageType.AI_GENERATED,
             )
-            self.history_manager.flush_message_buffer(
+            await self.history_manager.flush_message_buffer(
                 conversation_id, MessageType.AI_GENERATED
             )
 
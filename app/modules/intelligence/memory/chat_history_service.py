@@ -1,12 +1,20 @@
+import json
 import logging
+import os
+import time
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from redis import Redis
+from redis.exceptions import WatchError
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from uuid6 import uuid7
 
+from app.core.config_provider import config_provider
 from app.modules.conversations.message.message_model import (
     Message,
     MessageStatus,
@@ -15,33 +23,130 @@ from app.modules.conversations.message.message_model import (
 
 logger = logging.getLogger(__name__)
 
+# The latest active messages of a conversation are kept in Redis, windows up to
+# this size are served without touching Postgres
+HISTORY_CACHE_MESSAGES = int(os.getenv("HISTORY_CACHE_MESSAGES", 50))
+HISTORY_CACHE_TTL = int(os.getenv("HISTORY_CACHE_TTL", 24 * 3600))
+
+# A streamed reply is checkpointed to Redis whenever this much text or time has
+# passed since the last checkpoint, so clients can resume it and a crashed
+# worker does not lose it
+STREAM_CHECKPOINT_CHARS = int(os.getenv("STREAM_CHECKPOINT_CHARS", 2048))
+STREAM_CHECKPOINT_SECONDS = float(os.getenv("STREAM_CHECKPOINT_SECONDS", 2))
+STREAM_CHECKPOINT_TTL = int(os.getenv("STREAM_CHECKPOINT_TTL", 3600))
+# A streaming checkpoint not updated for this long belongs to a dead worker
+STREAM_STALE_SECONDS = int(os.getenv("STREAM_STALE_SECONDS", 300))
+STREAM_STATUS_STREAMING = "streaming"
+STREAM_STATUS_COMPLETED = "completed"
+
 
 class ChatHistoryServiceError(Exception):
     """Base exception class for ChatHistoryService errors."""
 
 
 class ChatHistoryService:
-    def __init__(self, db: Session):
+    _redis: Optional[Redis] = None
+
+    def __init__(self, db: Session, async_db: Optional[AsyncSession] = None):
         self.db = db
-        self.message_buffer: Dict[str, Dict[str, str]] = {}
+        # Used instead of db for history reads and message writes when given
+        self.async_db = async_db
+        self.message_buffer: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def _get_redis(cls) -> Redis:
+        if cls._redis is None:
+            cls._redis = Redis.from_url(config_provider.get_redis_url())
+        return cls._redis
+
+    async def _execute(self, statement):
+        if self.async_db is not None:
+            return await self.async_db.execute(statement)
+        return self.db.execute(statement)
+
+    def _add(self, instance):
+        if self.async_db is not None:
+            self.async_db.add(instance)
+        else:
+            self.db.add(instance)
+
+    async def _commit(self):
+        if self.async_db is not None:
+            await self.async_db.commit()
+        else:
+            self.db.commit()
+
+    async def _rollback(self):
+        if self.async_db is not None:
+            await self.async_db.rollback()
+        else:
+            self.db.rollback()
+
+    @staticmethod
+    def _history_key(conversation_id: str) -> str:
+        return f"chat_history:{conversation_id}"
+
+    @staticmethod
+    def _version_key(conversation_id: str) -> str:
+        # Bumped on every change to the history, a cache fill that started
+        # before a change is discarded instead of hiding the new message
+        return f"chat_history_version:{conversation_id}"
 
-    def get_session_history(
-        self, user_id: str, conversation_id: str
+    @staticmethod
+    def _to_langchain_message(message_type: str, content: str) -> BaseMessage:
+        if message_type == MessageType.HUMAN.value:
+            return HumanMessage(content=content)
+        return AIMessage(content=content)
+
+    async def get_session_history(
+        self, user_id: str, conversation_id: str, limit: Optional[int] = None
     ) -> List[BaseMessage]:
+        """
+        Active messages of a conversation, oldest first. With a limit only the
+        latest limit messages are loaded, from the history cache when it holds
+        the conversation.
+        """
         try:
-            messages = (
-                self.db.query(Message)
-                .filter_by(conversation_id=conversation_id)
-                .filter_by(status=MessageStatus.ACTIVE)  # Only fetch active messages
-                .order_by(Message.created_at)
-                .all()
-            )
-            history = []
-            for msg in messages:
-                if msg.type == MessageType.HUMAN:
-                    history.append(HumanMessage(content=msg.content))
-                else:
-                    history.append(AIMessage(content=msg.content))
+            if limit is not None and limit <= HISTORY_CACHE_MESSAGES:
+                cached = self._get_cached_history(conversation_id, limit)
+                if cached is not None:
+                    return [
+                        self._to_langchain_message(item["type"], item["content"])
+                        for item in cached
+                    ]
+
+            version = self._get_history_version(conversation_id)
+            query = select(Message.type, Message.content).where(
+                Message.conversation_id == conversation_id,
+                Message.status == MessageStatus.ACTIVE,  # Only fetch active messages
+            )
+            if limit is None:
+                result = await self._execute(query.order_by(Message.created_at))
+                messages = result.all()
+            else:
+                # Newest first so the (conversation_id, status, created_at)
+                # index stops after the window, at least a cache worth is read
+                result = await self._execute(
+                    query.order_by(Message.created_at.desc()).limit(
+                        max(limit, HISTORY_CACHE_MESSAGES)
+                    )
+                )
+                messages = result.all()[::-1]
+
+            items = [
+                {"type": message_type.value, "content": content}
+                for message_type, content in messages
+            ]
+            self._cache_history(
+                conversation_id, items[-HISTORY_CACHE_MESSAGES:], version
+            )
+            if limit is not None:
+                items = items[-limit:] if limit > 0 else []
+
+            history = [
+                self._to_langchain_message(item["type"], item["content"])
+                for item in items
+            ]
             logger.info(
                 f"Retrieved session history for conversation: {conversation_id}"
             )
@@ -63,6 +168,98 @@ class ChatHistoryService:
                 f"An unexpected error occurred while retrieving session history for conversation {conversation_id}"
             ) from e
 
+    def _get_cached_history(
+        self, conversation_id: str, limit: int
+    ) -> Optional[List[Dict[str, str]]]:
+        if limit <= 0:
+            return []
+        try:
+            payloads = self._get_redis().lrange(
+                self._history_key(conversation_id), -limit, -1
+            )
+        except Exception as e:
+            logger.warning(
+                f"History cache lookup failed for conversation {conversation_id}: {e}"
+            )
+            return None
+        # An empty conversation is never cached, an empty list is a miss
+        if not payloads:
+            return None
+        return [json.loads(payload) for payload in payloads]
+
+    def _get_history_version(self, conversation_id: str) -> Optional[bytes]:
+        try:
+            return self._get_redis().get(self._version_key(conversation_id))
+        except Exception as e:
+            logger.warning(
+                f"History cache lookup failed for conversation {conversation_id}: {e}"
+            )
+            return None
+
+    def _cache_history(
+        self,
+        conversation_id: str,
+        items: List[Dict[str, str]],
+        version: Optional[bytes],
+    ):
+        if not items:
+            return
+        key = self._history_key(conversation_id)
+        version_key = self._version_key(conversation_id)
+        try:
+            with self._get_redis().pipeline() as pipeline:
+                pipeline.watch(version_key)
+                if pipeline.get(version_key) != version:
+                    return
+                pipeline.multi()
+                pipeline.delete(key)
+                pipeline.rpush(key, *[json.dumps(item) for item in items])
+                pipeline.expire(key, HISTORY_CACHE_TTL)
+                pipeline.execute()
+        except WatchError:
+            logger.debug(
+                f"History of conversation {conversation_id} changed, not cached"
+            )
+        except Exception as e:
+            logger.warning(
+                f"History cache write failed for conversation {conversation_id}: {e}"
+            )
+
+    def _append_cached_history(
+        self, conversation_id: str, message_type: MessageType, content: str
+    ):
+        # Only extends a cached history, a partial list must not look complete
+        key = self._history_key(conversation_id)
+        version_key = self._version_key(conversation_id)
+        try:
+            pipeline = self._get_redis().pipeline()
+            pipeline.incr(version_key)
+            pipeline.expire(version_key, HISTORY_CACHE_TTL)
+            pipeline.rpushx(
+                key, json.dumps({"type": message_type.value, "content": content})
+            )
+            pipeline.ltrim(key, -HISTORY_CACHE_MESSAGES, -1)
+            pipeline.expire(key, HISTORY_CACHE_TTL)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(
+                f"History cache append failed for conversation {conversation_id}: {e}"
+            )
+
+    @classmethod
+    def invalidate_history(cls, conversation_id: str):
+        """Drop the cached history after messages are archived or deleted."""
+        try:
+            pipeline = cls._get_redis().pipeline()
+            pipeline.incr(cls._version_key(conversation_id))
+            pipeline.expire(cls._version_key(conversation_id), HISTORY_CACHE_TTL)
+            pipeline.delete(cls._history_key(conversation_id))
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(
+                f"History cache invalidation failed for conversation {conversation_id}: {e}"
+            )
+
     def add_message_chunk(
         self,
         conversation_id: str,
@@ -71,28 +268,161 @@ class ChatHistoryService:
         sender_id: Optional[str] = None,
         citations: Optional[List[str]] = None,
     ):
-        if conversation_id not in self.message_buffer:
-            self.message_buffer[conversation_id] = {"content": "", "citations": []}
-        self.message_buffer[conversation_id]["content"] += content
+        buffer = self.message_buffer.get(conversation_id)
+        if buffer is None:
+            buffer = self._new_buffer(message_type)
+            self.message_buffer[conversation_id] = buffer
+        if content:
+            buffer["chunks"].append(content)
+            buffer["size"] += len(content)
         if citations:
-            self.message_buffer[conversation_id]["citations"].extend(citations)
+            # Ordered set, duplicates are dropped as they arrive
+            buffer["citations"].update(dict.fromkeys(citations))
+
+        if (
+            buffer["size"] - buffer["checkpointed_size"] >= STREAM_CHECKPOINT_CHARS
+            or time.monotonic() - buffer["checkpointed_at"] >= STREAM_CHECKPOINT_SECONDS
+        ):
+            self._checkpoint(conversation_id, buffer)
         logger.debug(
             f"Added message chunk to buffer for conversation: {conversation_id}"
         )
 
-    def flush_message_buffer(
+    @staticmethod
+    def _new_buffer(message_type: MessageType) -> Dict[str, Any]:
+        return {
+            "chunks": [],
+            "citations": {},
+            "size": 0,
+            "message_type": message_type,
+            "checkpointed_chunks": 0,
+            "checkpointed_size": 0,
+            "checkpointed_at": time.monotonic(),
+        }
+
+    @staticmethod
+    def _stream_keys(conversation_id: str) -> Tuple[str, str]:
+        return (
+            f"chat_stream:{conversation_id}:content",
+            f"chat_stream:{conversation_id}:meta",
+        )
+
+    def _checkpoint(self, conversation_id: str, buffer: Dict[str, Any]):
+        """Append the text streamed since the last checkpoint to Redis."""
+        content_key, meta_key = self._stream_keys(conversation_id)
+        delta = "".join(buffer["chunks"][buffer["checkpointed_chunks"] :])
+        meta = {
+            "status": STREAM_STATUS_STREAMING,
+            "message_type": buffer["message_type"].value,
+            "citations": list(buffer["citations"]),
+            "size": buffer["size"],
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            pipeline = self._get_redis().pipeline()
+            if buffer["checkpointed_chunks"] == 0:
+                # First checkpoint of a message replaces the previous reply
+                pipeline.delete(content_key)
+            if delta:
+                pipeline.append(content_key, delta)
+            pipeline.set(meta_key, json.dumps(meta))
+            pipeline.expire(content_key, STREAM_CHECKPOINT_TTL)
+            pipeline.expire(meta_key, STREAM_CHECKPOINT_TTL)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(
+                f"Stream checkpoint failed for conversation {conversation_id}: {e}"
+            )
+        buffer["checkpointed_chunks"] = len(buffer["chunks"])
+        buffer["checkpointed_size"] = buffer["size"]
+        buffer["checkpointed_at"] = time.monotonic()
+
+    def _complete_checkpoint(self, conversation_id: str, message_id: str):
+        content_key, meta_key = self._stream_keys(conversation_id)
+        try:
+            pipeline = self._get_redis().pipeline()
+            pipeline.delete(content_key)
+            pipeline.set(
+                meta_key,
+                json.dumps(
+                    {"status": STREAM_STATUS_COMPLETED, "message_id": message_id}
+                ),
+                ex=STREAM_CHECKPOINT_TTL,
+            )
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(
+                f"Stream checkpoint completion failed for conversation {conversation_id}: {e}"
+            )
+
+    def get_stream_checkpoint(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        State of the reply being streamed in a conversation, None when there is
+        none. A streaming reply carries the content checkpointed so far, a
+        completed one the id of the stored message.
+        """
+        content_key, meta_key = self._stream_keys(conversation_id)
+        try:
+            pipeline = self._get_redis().pipeline()
+            pipeline.get(meta_key)
+            pipeline.get(content_key)
+            meta, content = pipeline.execute()
+        except Exception as e:
+            logger.warning(
+                f"Stream checkpoint lookup failed for conversation {conversation_id}: {e}"
+            )
+            return None
+        if meta is None:
+            return None
+        checkpoint = json.loads(meta)
+        if checkpoint["status"] == STREAM_STATUS_STREAMING:
+            checkpoint["content"] = content.decode("utf-8") if content else ""
+        return checkpoint
+
+    async def recover_stream_checkpoint(self, conversation_id: str) -> Optional[str]:
+        """
+        Store the partial reply of a stream that stopped checkpointing, e.g.
+        because its worker died, as a message. Returns the new message id.
+        """
+        checkpoint = self.get_stream_checkpoint(conversation_id)
+        if (
+            not checkpoint
+            or checkpoint["status"] != STREAM_STATUS_STREAMING
+            or not checkpoint["content"]
+        ):
+            return None
+        updated_at = datetime.fromisoformat(checkpoint["updated_at"])
+        if (
+            datetime.now(timezone.utc) - updated_at
+        ).total_seconds() < STREAM_STALE_SECONDS:
+            return None
+
+        message_type = MessageType(checkpoint["message_type"])
+        buffer = self._new_buffer(message_type)
+        buffer["chunks"].append(checkpoint["content"])
+        buffer["size"] = len(checkpoint["content"])
+        buffer["citations"].update(dict.fromkeys(checkpoint["citations"]))
+        # Already in Redis, flushing marks the checkpoint completed so the
+        # reply is not recovered twice
+        buffer["checkpointed_chunks"] = len(buffer["chunks"])
+        self.message_buffer[conversation_id] = buffer
+        message_id = await self.flush_message_buffer(conversation_id, message_type)
+        logger.info(
+            f"Recovered interrupted reply of conversation {conversation_id} as message {message_id}"
+        )
+        return message_id
+
+    async def flush_message_buffer(
         self,
         conversation_id: str,
         message_type: MessageType,
         sender_id: Optional[str] = None,
-    ):
+    ) -> Optional[str]:
         try:
-            if (
-                conversation_id in self.message_buffer
-                and self.message_buffer[conversation_id]["content"]
-            ):
-                content = self.message_buffer[conversation_id]["content"]
-                citations = self.message_buffer[conversation_id]["citations"]
+            buffer = self.message_buffer.get(conversation_id)
+            if buffer and buffer["size"]:
+                content = "".join(buffer["chunks"])
+                citations = list(buffer["citations"])
 
                 new_message = Message(
                     id=str(uuid7()),
@@ -101,22 +431,24 @@ class ChatHistoryService:
                     sender_id=sender_id if message_type == MessageType.HUMAN else None,
                     type=message_type,
                     created_at=datetime.now(timezone.utc),
-                    citations=(
-                        ",".join(set(citations)) if citations else None
-                    ),  # Use set to remove duplicates
+                    citations=",".join(citations) if citations else None,
                 )
-                self.db.add(new_message)
-                self.db.commit()
-                self.message_buffer[conversation_id] = {"content": "", "citations": []}
+                self._add(new_message)
+                await self._commit()
+                self._append_cached_history(conversation_id, message_type, content)
+                if buffer["checkpointed_chunks"]:
+                    self._complete_checkpoint(conversation_id, new_message.id)
+                del self.message_buffer[conversation_id]
                 logger.info(
                     f"Flushed message buffer for conversation: {conversation_id}"
                 )
+                return new_message.id
         except SQLAlchemyError as e:
             logger.error(
                 f"Database error in flush_message_buffer for conversation {conversation_id}: {e}",
                 exc_info=True,
             )
-            self.db.rollback()
+            await self._rollback()
             raise ChatHistoryServiceError(
                 f"Failed to flush message buffer for conversation {conversation_id}"
             ) from e
@@ -125,15 +457,17 @@ class ChatHistoryService:
                 f"Unexpected error in flush_message_buffer for conversation {conversation_id}: {e}",
                 exc_info=True,
             )
-            self.db.rollback()
+            await self._rollback()
             raise ChatHistoryServiceError(
                 f"An unexpected error occurred while flushing message buffer for conversation {conversation_id}"
             ) from e
+        return None
 
     def clear_session_history(self, conversation_id: str):
         try:
             self.db.query(Message).filter_by(conversation_id=conversation_id).delete()
             self.db.commit()
+            self.invalidate_history(conversation_id)
             logger.info(f"Cleared session history for conversation: {conversation_id}")
         except SQLAlchemyError as e:
             logger.error(
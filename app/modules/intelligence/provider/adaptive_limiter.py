@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Concurrency ceiling, the limit starts lower and grows while calls succeed
+LLM_MAX_CONCURRENCY = int(os.getenv("PARALLEL_REQUESTS", 50))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", 8))
+# Calls slower than this are treated as a sign of overload
+LLM_LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", 60))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 60))
+
+# Waiters re-check at least this often, a missed wake-up only costs this delay
+SLOT_WAIT_SECONDS = 1.0
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return (
+        getattr(error, "status_code", None) == 429
+        or "RateLimit" in type(error).__name__
+        or "429" in str(error)
+    )
+
+
+def is_retryable_error(error: Exception) -> bool:
+    # Other client errors (auth, bad request) fail the same way on every attempt
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int) and 400 <= status_code < 500:
+        return status_code in (408, 409, 429)
+    return True
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2**attempt)
+    # Jitter only spreads retries out, it needs no cryptographic randomness
+    return random.uniform(0, ceiling)  # nosec B311
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency and token budget for LLM calls to one provider.
+
+    The number of calls in flight follows AIMD: it grows by about one per
+    round of successful calls and is halved on a rate limit error, or cut by
+    a tenth when calls get slower than LLM_LATENCY_TARGET_SECONDS. Only calls
+    started after the last cut can cut again, so a burst of failures counts
+    once. A Retry-After header pauses every call to the provider.
+
+    When {PROVIDER}_TOKENS_PER_MINUTE or LLM_TOKENS_PER_MINUTE is set, calls
+    also draw their estimated tokens from a bucket refilled at that rate.
+
+    One limiter exists per provider and process, shared by every event loop.
+    """
+
+    _limiters: Dict[str, "AdaptiveLimiter"] = {}
+    _limiters_lock = threading.Lock()
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tokens_per_minute: int = 0,
+    ):
+        self.provider = provider
+        self.max_concurrency = max(max_concurrency, 1)
+        self.limit = float(min(LLM_INITIAL_CONCURRENCY, self.max_concurrency))
+        self.in_flight = 0
+        self.tokens_per_minute = tokens_per_minute
+        self.available_tokens = float(tokens_per_minute)
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._conditions: (
+            "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Condition]"
+        ) = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def for_provider(cls, provider: str) -> "AdaptiveLimiter":
+        with cls._limiters_lock:
+            if provider not in cls._limiters:
+                tokens_per_minute = int(
+                    os.getenv(f"{provider.upper()}_TOKENS_PER_MINUTE")
+                    or os.getenv("LLM_TOKENS_PER_MINUTE", 0)
+                )
+                cls._limiters[provider] = cls(
+                    provider, tokens_per_minute=tokens_per_minute
+                )
+            return cls._limiters[provider]
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """
+        Run call once a slot and its token budget are available, retrying
+        rate limits and transient errors with jittered exponential backoff.
+        The last error is raised when the retries are used up.
+        """
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self._acquire(tokens)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                self._release(started, error=True)
+                raise
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                retry_after = get_retry_after(e) if rate_limited else None
+                self._release(started, rate_limited=rate_limited, error=True)
+                if retry_after:
+                    with self._lock:
+                        self.paused_until = max(
+                            self.paused_until, time.monotonic() + retry_after
+                        )
+                await self._notify()
+                if attempt == LLM_MAX_RETRIES or not is_retryable_error(e):
+                    raise
+                delay = max(backoff_delay(attempt), retry_after or 0)
+                logger.warning(
+                    f"LLM call to {self.provider} failed on attempt {attempt + 1}, "
+                    f"retrying in {delay:.1f} seconds with concurrency limit "
+                    f"{int(self.limit)}: {e}"
+                )
+                await asyncio.sleep(delay)
+            else:
+                self._release(started)
+                await self._notify()
+                return result
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        condition = self._conditions.get(loop)
+        if condition is None:
+            condition = asyncio.Condition()
+            self._conditions[loop] = condition
+        return condition
+
+    async def _acquire(self, tokens: int):
+        condition = self._condition()
+        async with condition:
+            while True:
+                wait = self._try_admit(tokens)
+                if wait is None:
+                    return
+                try:
+                    await asyncio.wait_for(condition.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _notify(self):
+        condition = self._condition()
+        async with condition:
+            condition.notify(max(int(self.limit) - self.in_flight, 1))
+
+    def _try_admit(self, tokens: int) -> Optional[float]:
+        """Take a slot and the tokens, or return how long to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.in_flight >= int(self.limit):
+                return SLOT_WAIT_SECONDS
+            if self.tokens_per_minute:
+                rate = self.tokens_per_minute / 60
+                self.available_tokens = min(
+                    self.tokens_per_minute,
+                    self.available_tokens + (now - self.refilled_at) * rate,
+                )
+                self.refilled_at = now
+                # A call larger than the whole budget waits for a full bucket
+                needed = min(tokens, self.tokens_per_minute)
+                if self.available_tokens < needed:
+                    return (needed - self.available_tokens) / rate
+                self.available_tokens -= needed
+            self.in_flight += 1
+            return None
+
+    def _release(self, started: float, rate_limited: bool = False, error: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            latency = time.monotonic() - started
+            if rate_limited or (not error and latency > LLM_LATENCY_TARGET_SECONDS):
+                if started >= self.last_decrease:
+                    factor = 0.5 if rate_limited else 0.9
+                    self.limit = max(1.0, self.limit * factor)
+                    self.last_decrease = time.monotonic()
+                    logger.info(
+                        f"LLM concurrency limit for {self.provider} lowered to "
+                        f"{int(self.limit)} ({'rate limited' if rate_limited else f'{latency:.1f}s latency'})"
+                    )
+            elif not error:
+                self.limit = min(
+                    float(self.max_concurrency), self.limit + 1 / self.limit
+                )
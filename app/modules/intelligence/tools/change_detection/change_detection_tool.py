@@ -18,6 +18,7 @@ from app.modules.parsing.graph_construction.parsing_repomap import RepoMap
 from app.modules.parsing.knowledge_graph.inference_service import InferenceService
 from app.modules.projects.projects_service import ProjectService
 from app.modules.search.search_service import SearchService
+from app.modules.search.symbol_index import SymbolIndex
 
 
 class ChangeDetectionInput(BaseModel):
@@ -239,7 +240,12 @@ class ChangeDetectionTool:
                     identifiers = await self.get_updated_function_list(
                         patches_dict, project_id
                     )
+                    symbol_index = SymbolIndex.for_project(self.sql_db, project_id)
                     for identifier in identifiers:
+                        node_id = symbol_index.resolve(identifier)
+                        if node_id:
+                            node_ids.append(node_id)
+                            continue
                         node_id_query = " ".join(identifier.split(":"))
                         relevance_search = await self.search_service.search_codebase(
                             project_id, node_id_query
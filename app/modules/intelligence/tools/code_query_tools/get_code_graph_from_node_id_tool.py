@@ -3,10 +3,9 @@ import logging
 from typing import Any, Dict, List, Optional
 
 from langchain_core.tools import StructuredTool
-from neo4j import GraphDatabase
 from sqlalchemy.orm import Session
 
-from app.core.config_provider import config_provider
+from app.core.neo4j_driver import get_neo4j_driver
 from app.modules.projects.projects_model import Project
 
 
@@ -41,15 +40,7 @@ class GetCodeGraphFromNodeIdTool:
             sql_db (Session): SQLAlchemy database session.
         """
         self.sql_db = sql_db
-        self.neo4j_driver = self._create_neo4j_driver()
-
-    def _create_neo4j_driver(self) -> GraphDatabase.driver:
-        """Create and return a Neo4j driver instance."""
-        neo4j_config = config_provider.get_neo4j_config()
-        return GraphDatabase.driver(
-            neo4j_config["uri"],
-            auth=(neo4j_config["username"], neo4j_config["password"]),
-        )
+        self.neo4j_driver = get_neo4j_driver()
 
     async def arun(self, project_id: str, node_id: str) -> Dict[str, Any]:
         return await asyncio.to_thread(self.run, project_id, node_id)
@@ -202,11 +193,6 @@ class GetCodeGraphFromNodeIdTool:
         except ValueError:
             return file_path
 
-    def __del__(self):
-        """Ensure Neo4j driver is closed when the object is destroyed."""
-        if hasattr(self, "neo4j_driver"):
-            self.neo4j_driver.close()
-
 
 def get_code_graph_from_node_id_tool(sql_db: Session) -> StructuredTool:
     tool_instance = GetCodeGraphFromNodeIdTool(sql_db)
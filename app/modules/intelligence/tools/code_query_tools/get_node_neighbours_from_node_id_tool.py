@@ -3,11 +3,10 @@ import logging
 from typing import Any, Dict, List, Optional
 
 from langchain_core.tools import StructuredTool
-from neo4j import GraphDatabase
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.core.config_provider import config_provider
+from app.core.neo4j_driver import get_neo4j_driver
 
 
 class GetNodeNeighboursInput(BaseModel):
@@ -42,15 +41,7 @@ class GetNodeNeighboursFromNodeIdTool:
             sql_db (Session): SQLAlchemy database session.
         """
         self.sql_db = sql_db
-        self.neo4j_driver = self._create_neo4j_driver()
-
-    def _create_neo4j_driver(self) -> GraphDatabase.driver:
-        """Create and return a Neo4j driver instance."""
-        neo4j_config = config_provider.get_neo4j_config()
-        return GraphDatabase.driver(
-            neo4j_config["uri"],
-            auth=(neo4j_config["username"], neo4j_config["password"]),
-        )
+        self.neo4j_driver = get_neo4j_driver()
 
     async def arun(self, project_id: str, node_ids: List[str]) -> Dict[str, Any]:
         return await asyncio.to_thread(self.run, project_id, node_ids)
@@ -111,11 +102,6 @@ class GetNodeNeighboursFromNodeIdTool:
                 return None
             return record["neighbors"]
 
-    def __del__(self):
-        """Ensure Neo4j driver is closed when the object is destroyed."""
-        if hasattr(self, "neo4j_driver"):
-            self.neo4j_driver.close()
-
 
 def get_node_neighbours_from_node_id_tool(sql_db: Session) -> StructuredTool:
     tool_instance = GetNodeNeighboursFromNodeIdTool(sql_db)
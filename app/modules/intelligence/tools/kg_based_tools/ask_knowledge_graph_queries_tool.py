@@ -58,11 +58,22 @@ class KnowledgeGraphQueryTool:
         self, queries: List[QueryRequest]
     ) -> Dict[str, str]:
         inference_service = InferenceService(self.sql_db, "dummy")
+        # Embed all queries of the call in one batch, off the event loop
+        embeddings = await asyncio.to_thread(
+            inference_service.embedding_service.embed_queries,
+            [query_request.query for query_request in queries],
+        )
 
-        async def process_query(query_request: QueryRequest) -> List[QueryResponse]:
-            # Call the query_vector_index method directly from InferenceService
-            results = inference_service.query_vector_index(
-                query_request.project_id, query_request.query, query_request.node_ids
+        async def process_query(
+            query_request: QueryRequest, embedding: List[float]
+        ) -> List[QueryResponse]:
+            # The Neo4j query blocks, so it runs in a thread as well
+            results = await asyncio.to_thread(
+                inference_service.query_vector_index,
+                query_request.project_id,
+                query_request.query,
+                query_request.node_ids,
+                embedding=embedding,
             )
             return [
                 QueryResponse(
@@ -76,7 +87,10 @@ class KnowledgeGraphQueryTool:
                 for result in results
             ]
 
-        tasks = [process_query(query) for query in queries]
+        tasks = [
+            process_query(query, embedding)
+            for query, embedding in zip(queries, embeddings)
+        ]
         results = await asyncio.gather(*tasks)
 
         return results
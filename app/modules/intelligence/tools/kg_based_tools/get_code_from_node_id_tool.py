@@ -3,12 +3,13 @@ import logging
 from typing import Any, Dict
 
 from langchain_core.tools import StructuredTool
-from neo4j import GraphDatabase
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.core.config_provider import config_provider
-from app.modules.code_provider.code_provider_service import CodeProviderService
+from app.core.neo4j_driver import get_neo4j_driver
+from app.modules.intelligence.tools.kg_based_tools.graph_code_reader import (
+    GraphCodeReader,
+)
 from app.modules.projects.projects_model import Project
 
 logger = logging.getLogger(__name__)
@@ -37,14 +38,8 @@ class GetCodeFromNodeIdTool:
     def __init__(self, sql_db: Session, user_id: str):
         self.sql_db = sql_db
         self.user_id = user_id
-        self.neo4j_driver = self._create_neo4j_driver()
-
-    def _create_neo4j_driver(self) -> GraphDatabase.driver:
-        neo4j_config = config_provider.get_neo4j_config()
-        return GraphDatabase.driver(
-            neo4j_config["uri"],
-            auth=(neo4j_config["username"], neo4j_config["password"]),
-        )
+        self.neo4j_driver = get_neo4j_driver()
+        self.code_reader = GraphCodeReader(self.sql_db, self.neo4j_driver)
 
     async def arun(self, project_id: str, node_id: str) -> Dict[str, Any]:
         return await asyncio.to_thread(self.run, project_id, node_id)
@@ -98,14 +93,7 @@ class GetCodeFromNodeIdTool:
 
         relative_file_path = self._get_relative_file_path(file_path)
 
-        code_content = CodeProviderService(self.sql_db).get_file_content(
-            project.repo_name,
-            relative_file_path,
-            start_line,
-            end_line,
-            project.branch_name,
-            project.id,
-        )
+        code_content = self.code_reader.get_code(project, node_data, relative_file_path)
 
         docstring = None
         if node_data.get("docstring", None):
@@ -129,10 +117,6 @@ class GetCodeFromNodeIdTool:
         except ValueError:
             return file_path
 
-    def __del__(self):
-        if hasattr(self, "neo4j_driver"):
-            self.neo4j_driver.close()
-
 
 def get_code_from_node_id_tool(sql_db: Session, user_id: str) -> StructuredTool:
     tool_instance = GetCodeFromNodeIdTool(sql_db, user_id)
@@ -3,15 +3,17 @@ import logging
 from typing import Any, Dict, List
 
 from langchain_core.tools import StructuredTool
-from neo4j import GraphDatabase
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.core.config_provider import config_provider
-from app.modules.code_provider.code_provider_service import CodeProviderService
+from app.core.neo4j_driver import get_neo4j_driver
+from app.modules.intelligence.tools.kg_based_tools.graph_code_reader import (
+    GraphCodeReader,
+)
 from app.modules.projects.projects_model import Project
 from app.modules.projects.projects_service import ProjectService
 from app.modules.search.search_service import SearchService
+from app.modules.search.symbol_index import SymbolIndex
 
 logger = logging.getLogger(__name__)
 
@@ -44,29 +46,26 @@ class GetCodeFromProbableNodeNameTool:
     def __init__(self, sql_db: Session, user_id: str):
         self.sql_db = sql_db
         self.user_id = user_id
-        self.neo4j_driver = self._create_neo4j_driver()
+        self.neo4j_driver = get_neo4j_driver()
+        self.code_reader = GraphCodeReader(self.sql_db, self.neo4j_driver)
         self.search_service = SearchService(self.sql_db)
 
-    def _create_neo4j_driver(self) -> GraphDatabase.driver:
-        neo4j_config = config_provider.get_neo4j_config()
-        return GraphDatabase.driver(
-            neo4j_config["uri"],
-            auth=(neo4j_config["username"], neo4j_config["password"]),
-        )
-
     async def process_probable_node_name(
         self, project_id: str, probable_node_name: str
     ):
         try:
-            node_id_query = " ".join(
-                probable_node_name.replace("/", " ").replace(":", " ").split()
+            node_id = SymbolIndex.for_project(self.sql_db, project_id).resolve(
+                probable_node_name
             )
-            relevance_search = await self.search_service.search_codebase(
-                project_id, node_id_query
-            )
-            node_id = None
-            if relevance_search:
-                node_id = relevance_search[0]["node_id"]
+            if not node_id:
+                node_id_query = " ".join(
+                    probable_node_name.replace("/", " ").replace(":", " ").split()
+                )
+                relevance_search = await self.search_service.search_codebase(
+                    project_id, node_id_query
+                )
+                if relevance_search:
+                    node_id = relevance_search[0]["node_id"]
 
             if not node_id:
                 return {
@@ -168,14 +167,7 @@ class GetCodeFromProbableNodeNameTool:
 
         relative_file_path = self._get_relative_file_path(file_path)
 
-        code_content = CodeProviderService(self.sql_db).get_file_content(
-            project.repo_name,
-            relative_file_path,
-            start_line,
-            end_line,
-            project.branch_name,
-            project.id,
-        )
+        code_content = self.code_reader.get_code(project, node_data, relative_file_path)
 
         docstring = None
         if node_data.get("docstring", None):
@@ -199,10 +191,6 @@ class GetCodeFromProbableNodeNameTool:
         except ValueError:
             return file_path
 
-    def __del__(self):
-        if hasattr(self, "neo4j_driver"):
-            self.neo4j_driver.close()
-
 
 def get_code_from_probable_node_name_tool(
     sql_db: Session, user_id: str
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.modules.code_provider.code_provider_service import CodeProviderService
+from app.modules.projects.projects_model import Project
+from app.modules.projects.projects_schema import ProjectStatusEnum
+
+logger = logging.getLogger(__name__)
+
+# "graph" serves code from the knowledge graph when it is current, "provider"
+# always goes back to the code provider
+CODE_RETRIEVAL_MODE = os.getenv("CODE_RETRIEVAL_MODE", "graph")
+
+# Statuses in which the graph was written from the project's commit_id. While a
+# project is submitted or cloned, commit_id may already point at the next commit.
+GRAPH_CURRENT_STATUSES = {
+    ProjectStatusEnum.PARSED.value,
+    ProjectStatusEnum.PROCESSING.value,
+    ProjectStatusEnum.READY.value,
+}
+
+
+class GraphCodeReader:
+    """
+    Serves node code from the text stored in the knowledge graph.
+
+    FILE nodes of graphs built by RepoMap carry the text of the file at the
+    parsed commit, so line ranges are sliced from it exactly as the code
+    provider would slice the fetched file. Those nodes are recognised by their
+    text_hash, which must match the stored text. blar_graph FILE nodes have no
+    text_hash, their text is abbreviated with references to other nodes, so
+    they and anything the graph no longer holds are read through
+    CodeProviderService.
+    """
+
+    def __init__(self, sql_db: Session, neo4j_driver):
+        self.sql_db = sql_db
+        self.neo4j_driver = neo4j_driver
+
+    def get_code(
+        self, project: Project, node_data: Dict[str, Any], relative_file_path: str
+    ) -> str:
+        start_line = node_data["start_line"]
+        end_line = node_data["end_line"]
+
+        if CODE_RETRIEVAL_MODE == "graph" and project.status in GRAPH_CURRENT_STATUSES:
+            code = self._get_code_from_graph(project.id, node_data)
+            if code is not None:
+                return code
+
+        return CodeProviderService(self.sql_db).get_file_content(
+            project.repo_name,
+            relative_file_path,
+            start_line,
+            end_line,
+            project.branch_name,
+            project.id,
+        )
+
+    def _get_code_from_graph(
+        self, project_id: str, node_data: Dict[str, Any]
+    ) -> Optional[str]:
+        start_line = node_data["start_line"]
+        end_line = node_data["end_line"]
+        try:
+            file_text = self._get_file_text(project_id, node_data["file_path"])
+        except Exception as e:
+            logger.warning(
+                f"Reading file text from the graph failed for project {project_id}: {e}"
+            )
+            file_text = None
+
+        if file_text is None:
+            return None
+        return CodeProviderService.select_lines(
+            file_text.splitlines(keepends=True), start_line, end_line
+        )
+
+    def _get_file_text(self, project_id: str, file_path: str) -> Optional[str]:
+        query = """
+        MATCH (f:NODE {repoId: $project_id, file_path: $file_path})
+        WHERE f:FILE AND f.text IS NOT NULL AND f.text_hash IS NOT NULL
+        RETURN f.text AS text, f.text_hash AS text_hash
+        LIMIT 1
+        """
+        with self.neo4j_driver.session() as session:
+            record = session.run(
+                query, project_id=project_id, file_path=file_path
+            ).single()
+        if not record:
+            return None
+        # Same hash as CodeGraphService.generate_text_hash
+        text_hash = hashlib.sha256(record["text"].encode("utf-8")).hexdigest()
+        if text_hash != record["text_hash"]:
+            logger.warning(
+                f"Stored text of {file_path} in project {project_id} does not match its hash"
+            )
+            return None
+        return record["text"]
@@ -1,4 +1,6 @@
-from typing import Dict, List
+import threading
+from functools import cached_property
+from typing import Callable, Dict, List, Optional
 
 from sqlalchemy.orm import Session
 
@@ -51,84 +53,149 @@ from langchain_core.tools import StructuredTool
 from .think_tool import think_tool
 
 
+# Tool definitions by id. A definition binds the tool to the db session and user
+# of a ToolService, or returns None when the tool is not configured. Tools are
+# only built when an agent asks for them.
+TOOL_DEFINITIONS: Dict[str, Callable[["ToolService"], Optional[StructuredTool]]] = {
+    "get_code_from_probable_node_name": lambda service: get_code_from_probable_node_name_tool(
+        service.db, service.user_id
+    ),
+    "get_code_from_node_id": lambda service: get_code_from_node_id_tool(
+        service.db, service.user_id
+    ),
+    "get_code_from_multiple_node_ids": lambda service: get_code_from_multiple_node_ids_tool(
+        service.db, service.user_id
+    ),
+    "ask_knowledge_graph_queries": lambda service: get_ask_knowledge_graph_queries_tool(
+        service.db, service.user_id
+    ),
+    "get_nodes_from_tags": lambda service: get_nodes_from_tags_tool(
+        service.db, service.user_id
+    ),
+    "get_code_graph_from_node_id": lambda service: get_code_graph_from_node_id_tool(
+        service.db
+    ),
+    "change_detection": lambda service: get_change_detection_tool(service.user_id),
+    "get_code_file_structure": lambda service: get_code_file_structure_tool(service.db),
+    "get_node_neighbours_from_node_id": lambda service: get_node_neighbours_from_node_id_tool(
+        service.db
+    ),
+    "get_linear_issue": lambda service: get_linear_issue_tool(
+        service.db, service.user_id
+    ),
+    "update_linear_issue": lambda service: update_linear_issue_tool(
+        service.db, service.user_id
+    ),
+    "intelligent_code_graph": lambda service: get_intelligent_code_graph_tool(
+        service.db, service.provider_service, service.user_id
+    ),
+    "think": lambda service: think_tool(service.db, service.user_id),
+    "webpage_extractor": lambda service: webpage_extractor_tool(
+        service.db, service.user_id
+    ),
+    "github_tool": lambda service: github_tool(service.db, service.user_id),
+    "web_search_tool": lambda service: web_search_tool(service.db, service.user_id),
+}
+
+
 class ToolService:
-    def __init__(self, db: Session, user_id: str):
+    """
+    Tools of one request, bound to its db session and user.
+
+    Creating the service is cheap: each tool is built on first use and reused
+    for the rest of the request. Tool names, descriptions and parameters do not
+    depend on the user, they are computed once per process.
+    """
+
+    _tool_infos: Optional[Dict[str, ToolInfoWithParameters]] = None
+    _tool_infos_lock = threading.Lock()
+
+    def __init__(
+        self,
+        db: Session,
+        user_id: str,
+        provider_service: Optional[ProviderService] = None,
+    ):
         self.db = db
         self.user_id = user_id
-        self.webpage_extractor_tool = webpage_extractor_tool(db, user_id)
-        self.web_search_tool = web_search_tool(db, user_id)
-        self.github_tool = github_tool(db, user_id)
-        self.get_code_from_multiple_node_ids_tool = GetCodeFromMultipleNodeIdsTool(
-            self.db, self.user_id
-        )
-        self.get_code_graph_from_node_id_tool = GetCodeGraphFromNodeIdTool(db)
-        self.file_structure_tool = GetCodeFileStructureTool(db)
-        self.provider_service = ProviderService.create(db, user_id)
-        self.tools = self._initialize_tools()
+        if provider_service is not None:
+            self.provider_service = provider_service
+        self._tools: Dict[str, Optional[StructuredTool]] = {}
+
+    @cached_property
+    def provider_service(self) -> ProviderService:
+        return ProviderService.create(self.db, self.user_id)
+
+    @cached_property
+    def get_code_from_multiple_node_ids_tool(self) -> GetCodeFromMultipleNodeIdsTool:
+        return GetCodeFromMultipleNodeIdsTool(self.db, self.user_id)
+
+    @cached_property
+    def get_code_graph_from_node_id_tool(self) -> GetCodeGraphFromNodeIdTool:
+        return GetCodeGraphFromNodeIdTool(self.db)
+
+    @cached_property
+    def file_structure_tool(self) -> GetCodeFileStructureTool:
+        return GetCodeFileStructureTool(self.db)
+
+    @cached_property
+    def webpage_extractor_tool(self) -> Optional[StructuredTool]:
+        return self.get_tool("webpage_extractor")
+
+    @cached_property
+    def web_search_tool(self) -> Optional[StructuredTool]:
+        return self.get_tool("web_search_tool")
+
+    @cached_property
+    def github_tool(self) -> Optional[StructuredTool]:
+        return self.get_tool("github_tool")
+
+    @cached_property
+    def tools(self) -> Dict[str, StructuredTool]:
+        """Every configured tool, building the ones not used yet."""
+        tools = {}
+        for tool_id in TOOL_DEFINITIONS:
+            tool = self.get_tool(tool_id)
+            if tool is not None:
+                tools[tool_id] = tool
+        return tools
+
+    def get_tool(self, tool_id: str) -> Optional[StructuredTool]:
+        if tool_id not in TOOL_DEFINITIONS:
+            return None
+        if tool_id not in self._tools:
+            self._tools[tool_id] = TOOL_DEFINITIONS[tool_id](self)
+        return self._tools[tool_id]
 
     def get_tools(self, tool_names: List[str]) -> List[StructuredTool]:
         """get tools if exists"""
         tools = []
         for tool_name in tool_names:
-            if self.tools.get(tool_name) is not None:
-                tools.append(self.tools[tool_name])
+            tool = self.get_tool(tool_name)
+            if tool is not None:
+                tools.append(tool)
         return tools
 
-    def _initialize_tools(self) -> Dict[str, StructuredTool]:
-        tools = {
-            "get_code_from_probable_node_name": get_code_from_probable_node_name_tool(
-                self.db, self.user_id
-            ),
-            "get_code_from_node_id": get_code_from_node_id_tool(self.db, self.user_id),
-            "get_code_from_multiple_node_ids": get_code_from_multiple_node_ids_tool(
-                self.db, self.user_id
-            ),
-            "ask_knowledge_graph_queries": get_ask_knowledge_graph_queries_tool(
-                self.db, self.user_id
-            ),
-            "get_nodes_from_tags": get_nodes_from_tags_tool(self.db, self.user_id),
-            "get_code_graph_from_node_id": get_code_graph_from_node_id_tool(self.db),
-            "change_detection": get_change_detection_tool(self.user_id),
-            "get_code_file_structure": get_code_file_structure_tool(self.db),
-            "get_node_neighbours_from_node_id": get_node_neighbours_from_node_id_tool(
-                self.db
-            ),
-            "get_linear_issue": get_linear_issue_tool(self.db, self.user_id),
-            "update_linear_issue": update_linear_issue_tool(self.db, self.user_id),
-            "intelligent_code_graph": get_intelligent_code_graph_tool(
-                self.db, self.provider_service, self.user_id
-            ),
-            "think": think_tool(self.db, self.user_id),
-        }
-
-        if self.webpage_extractor_tool:
-            tools["webpage_extractor"] = self.webpage_extractor_tool
-
-        if self.github_tool:
-            tools["github_tool"] = self.github_tool
-
-        if self.web_search_tool:
-            tools["web_search_tool"] = self.web_search_tool
-
-        return tools
+    def _get_tool_infos(self) -> Dict[str, ToolInfoWithParameters]:
+        if ToolService._tool_infos is None:
+            with ToolService._tool_infos_lock:
+                if ToolService._tool_infos is None:
+                    ToolService._tool_infos = {
+                        tool_id: ToolInfoWithParameters(
+                            id=tool_id,
+                            name=tool.name,
+                            description=tool.description,
+                            args_schema=tool.args_schema.schema(),
+                        )
+                        for tool_id, tool in self.tools.items()
+                    }
+        return ToolService._tool_infos
 
     def list_tools(self) -> List[ToolInfo]:
         return [
-            ToolInfo(
-                id=tool_id,
-                name=tool.name,
-                description=tool.description,
-            )
-            for tool_id, tool in self.tools.items()
+            ToolInfo(id=tool_id, name=info.name, description=info.description)
+            for tool_id, info in self._get_tool_infos().items()
         ]
 
     def list_tools_with_parameters(self) -> Dict[str, ToolInfoWithParameters]:
-        return {
-            tool_id: ToolInfoWithParameters(
-                id=tool_id,
-                name=tool.name,
-                description=tool.description,
-                args_schema=tool.args_schema.schema(),
-            )
-            for tool_id, tool in self.tools.items()
-        }
+        return dict(self._get_tool_infos())
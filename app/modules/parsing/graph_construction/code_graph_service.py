@@ -1,18 +1,21 @@
 import hashlib
 import logging
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
-from neo4j import GraphDatabase
 from sqlalchemy.orm import Session
 
+from app.core.neo4j_driver import get_neo4j_driver
+from app.modules.parsing.graph_construction.graph_bulk_loader import GraphBulkLoader
+from app.modules.parsing.graph_construction.graph_csv_importer import GraphCsvImporter
 from app.modules.parsing.graph_construction.parsing_repomap import RepoMap
+from app.modules.parsing.knowledge_graph.inference_service import REFERENCE_PATTERN
 from app.modules.search.search_service import SearchService
 
 
 class CodeGraphService:
     def __init__(self, neo4j_uri, neo4j_user, neo4j_password, db: Session):
-        self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        self.driver = get_neo4j_driver(neo4j_uri, neo4j_user, neo4j_password)
         self.db = db
 
     @staticmethod
@@ -29,10 +32,73 @@ class CodeGraphService:
 
         return node_id
 
-    def close(self):
-        self.driver.close()
+    @staticmethod
+    def generate_text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def process_node(
+        node_id: str, node_data: Dict, project_id: str, user_id: str
+    ) -> Optional[Dict]:
+        # Get the node type and ensure it's one of our expected types
+        node_type = node_data.get("type", "UNKNOWN")
+        if node_type == "UNKNOWN":
+            return None
+        # Initialize labels with NODE
+        labels = ["NODE"]
+
+        # Add specific type label if it's a valid type
+        if node_type in ["FILE", "CLASS", "FUNCTION", "INTERFACE"]:
+            labels.append(node_type)
+
+        text = node_data.get("text", "")
+
+        # Prepare node data
+        processed_node = {
+            "name": node_data.get("name", node_id),  # Use node_id as fallback
+            "file_path": node_data.get("file", ""),
+            "start_line": node_data.get("line", -1),
+            "end_line": node_data.get("end_line", -1),
+            "repoId": project_id,
+            "node_id": CodeGraphService.generate_node_id(node_id, user_id),
+            "entityId": user_id,
+            "type": node_type,
+            "text": text,
+            # text is dropped from the graph after inference, the hash lets
+            # incremental parses tell which nodes actually changed
+            "text_hash": CodeGraphService.generate_text_hash(text or ""),
+            "labels": labels,
+        }
+
+        # Remove None values
+        return {k: v for k, v in processed_node.items() if v is not None}
+
+    @staticmethod
+    def process_edge(
+        source: str, target: str, data: Dict, project_id: str, user_id: str
+    ) -> Dict:
+        edge_data = {
+            "source_id": CodeGraphService.generate_node_id(source, user_id),
+            "target_id": CodeGraphService.generate_node_id(target, user_id),
+            "type": data.get("type", "REFERENCES"),
+            "repoId": project_id,
+        }
+        # Remove any null values from edge_data
+        return {k: v for k, v in edge_data.items() if v is not None}
 
-    def create_and_store_graph(self, repo_dir, project_id, user_id):
+    def close(self):
+        # The Neo4j driver is shared by the process and closed on shutdown
+        pass
+
+    def create_and_store_graph(
+        self, repo_dir, project_id, user_id, bulk_import: bool = False
+    ):
+        """
+        Build the project graph and write it to Neo4j.
+
+        With bulk_import, used for projects that have no graph yet, the graph is
+        loaded through the offline CSV import path when NEO4J_IMPORT_DIR is set.
+        """
         # Create the graph using RepoMap
         self.repo_map = RepoMap(
             root=repo_dir,
@@ -43,95 +109,224 @@ class CodeGraphService:
 
         nx_graph = self.repo_map.create_graph(repo_dir)
 
+        start_time = time.time()
+        logging.info(
+            f"Creating {nx_graph.number_of_nodes()} nodes and {nx_graph.number_of_edges()} relationships"
+        )
+
+        # Nodes and edges are generated lazily and walked exactly once
+        nodes = filter(
+            None,
+            (
+                CodeGraphService.process_node(node_id, node_data, project_id, user_id)
+                for node_id, node_data in nx_graph.nodes(data=True)
+            ),
+        )
+        edges = (
+            CodeGraphService.process_edge(source, target, data, project_id, user_id)
+            for source, target, data in nx_graph.edges(data=True)
+        )
+
+        importer = GraphCsvImporter.from_env(self.driver) if bulk_import else None
+        if importer:
+            importer.import_graph(project_id, nodes, edges)
+        else:
+            loader = GraphBulkLoader(self.driver)
+            loader.create_indices()
+            loader.load_nodes(nodes)
+            loader.load_edges(edges)
+
+        end_time = time.time()
+        logging.info(
+            f"Time taken to create graph and search index: {end_time - start_time:.2f} seconds"
+        )
+
+    def update_graph_incremental(
+        self,
+        repo_dir: str,
+        project_id: str,
+        user_id: str,
+        changed_files: Set[str],
+        deleted_files: Set[str],
+    ) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Patch an existing project graph with the nodes and edges of the touched files.
+
+        Reference resolution needs the definitions of the whole repository, so the
+        graph is rebuilt in memory, but only nodes and edges belonging to changed or
+        deleted files are written. Nodes whose text hash is unchanged keep their
+        docstring and embedding, search index entries of nodes whose name or path
+        changed are rewritten.
+
+        Returns:
+            The node_ids that are new or whose text changed and need inference, and
+            the text of the untouched nodes they reference, which is no longer
+            stored in the graph once inference has run.
+        """
+        touched_files = set(changed_files) | set(deleted_files)
+        if not touched_files:
+            return [], {}
+
+        self.repo_map = RepoMap(
+            root=repo_dir,
+            verbose=True,
+            main_model=SimpleTokenCounter(),
+            io=SimpleIO(),
+        )
+        nx_graph = self.repo_map.create_graph(repo_dir)
+
+        new_nodes = {}
+        for node_id, node_data in nx_graph.nodes(data=True):
+            if node_data.get("file") not in touched_files:
+                continue
+            processed_node = CodeGraphService.process_node(
+                node_id, node_data, project_id, user_id
+            )
+            if processed_node:
+                new_nodes[processed_node["node_id"]] = processed_node
+
+        edges_to_create = [
+            CodeGraphService.process_edge(source, target, data, project_id, user_id)
+            for source, target, data in nx_graph.edges(data=True)
+            if nx_graph.nodes[source].get("file") in touched_files
+            or nx_graph.nodes[target].get("file") in touched_files
+        ]
+
         with self.driver.session() as session:
             start_time = time.time()
-            node_count = nx_graph.number_of_nodes()
-            logging.info(f"Creating {node_count} nodes")
+            result = session.run(
+                """
+                MATCH (n:NODE {repoId: $project_id})
+                WHERE n.file_path IN $file_paths
+                RETURN n.node_id AS node_id, n.type AS type, n.text_hash AS text_hash,
+                    n.name AS name, n.file_path AS file_path
+                """,
+                project_id=project_id,
+                file_paths=list(touched_files),
+            )
+            existing_nodes = {record["node_id"]: dict(record) for record in result}
+
+            removed_ids = []
+            nodes_to_create = []
+            nodes_to_update = []
+            moved_nodes = []
+            inference_ids = []
+            for node_id, existing in existing_nodes.items():
+                node = new_nodes.get(node_id)
+                if node is None or node["type"] != existing["type"]:
+                    removed_ids.append(node_id)
+            for node_id, node in new_nodes.items():
+                existing = existing_nodes.get(node_id)
+                if existing is None or node["type"] != existing["type"]:
+                    nodes_to_create.append(node)
+                    inference_ids.append(node_id)
+                else:
+                    node["changed"] = node["text_hash"] != existing["text_hash"]
+                    nodes_to_update.append(node)
+                    if node["changed"]:
+                        inference_ids.append(node_id)
+                    if (node["name"], node["file_path"]) != (
+                        existing["name"],
+                        existing["file_path"],
+                    ):
+                        moved_nodes.append(node)
+
+            logging.info(
+                f"Incremental update for project {project_id}: {len(touched_files)} files, "
+                f"{len(nodes_to_create)} created, {len(nodes_to_update)} updated, "
+                f"{len(removed_ids)} removed nodes"
+            )
 
-            # Batch insert nodes
             batch_size = 300
-            for i in range(0, node_count, batch_size):
-                batch_nodes = list(nx_graph.nodes(data=True))[i : i + batch_size]
-                nodes_to_create = []
-
-                for node_id, node_data in batch_nodes:
-                    # Get the node type and ensure it's one of our expected types
-                    node_type = node_data.get("type", "UNKNOWN")
-                    if node_type == "UNKNOWN":
-                        continue
-                    # Initialize labels with NODE
-                    labels = ["NODE"]
-
-                    # Add specific type label if it's a valid type
-                    if node_type in ["FILE", "CLASS", "FUNCTION", "INTERFACE"]:
-                        labels.append(node_type)
-
-                    # Prepare node data
-                    processed_node = {
-                        "name": node_data.get(
-                            "name", node_id
-                        ),  # Use node_id as fallback
-                        "file_path": node_data.get("file", ""),
-                        "start_line": node_data.get("line", -1),
-                        "end_line": node_data.get("end_line", -1),
-                        "repoId": project_id,
-                        "node_id": CodeGraphService.generate_node_id(node_id, user_id),
-                        "entityId": user_id,
-                        "type": node_type,
-                        "text": node_data.get("text", ""),
-                        "labels": labels,
-                    }
-
-                    # Remove None values
-                    processed_node = {
-                        k: v for k, v in processed_node.items() if v is not None
-                    }
-                    nodes_to_create.append(processed_node)
-
-                # Create nodes with labels
+            for i in range(0, len(removed_ids), batch_size):
                 session.run(
                     """
-                    UNWIND $nodes AS node
-                    CALL apoc.create.node(node.labels, node) YIELD node AS n
-                    RETURN count(*) AS created_count
+                    MATCH (n:NODE {repoId: $project_id})
+                    WHERE n.node_id IN $node_ids
+                    DETACH DELETE n
                     """,
-                    nodes=nodes_to_create,
+                    project_id=project_id,
+                    node_ids=removed_ids[i : i + batch_size],
                 )
 
-            relationship_count = nx_graph.number_of_edges()
-            logging.info(f"Creating {relationship_count} relationships")
-
-            # Create relationships in batches
-            for i in range(0, relationship_count, batch_size):
-                batch_edges = list(nx_graph.edges(data=True))[i : i + batch_size]
-                edges_to_create = []
-                for source, target, data in batch_edges:
-                    edge_data = {
-                        "source_id": CodeGraphService.generate_node_id(source, user_id),
-                        "target_id": CodeGraphService.generate_node_id(target, user_id),
-                        "type": data.get("type", "REFERENCES"),
-                        "repoId": project_id,
-                    }
-                    # Remove any null values from edge_data
-                    edge_data = {k: v for k, v in edge_data.items() if v is not None}
-                    edges_to_create.append(edge_data)
-
+            # Relationships of surviving nodes are rebuilt from the new graph.
+            # Text is only set on changed nodes, inference removes it again
+            # from remote repos once their docstrings are written
+            for i in range(0, len(nodes_to_update), batch_size):
                 session.run(
                     """
-                    UNWIND $edges AS edge
-                    MATCH (source:NODE {node_id: edge.source_id, repoId: edge.repoId})
-                    MATCH (target:NODE {node_id: edge.target_id, repoId: edge.repoId})
-                    CALL apoc.create.relationship(source, edge.type, {repoId: edge.repoId}, target) YIELD rel
-                    RETURN count(rel) AS created_count
+                    UNWIND $nodes AS node
+                    MATCH (n:NODE {repoId: $project_id, node_id: node.node_id})
+                    OPTIONAL MATCH (n)-[r]-()
+                    DELETE r
+                    WITH DISTINCT n, node
+                    SET n.name = node.name,
+                        n.file_path = node.file_path,
+                        n.start_line = node.start_line,
+                        n.end_line = node.end_line,
+                        n.text_hash = node.text_hash
+                    FOREACH (_ IN CASE WHEN node.changed THEN [1] ELSE [] END |
+                        SET n.text = node.text
+                        REMOVE n.docstring, n.embedding, n.tags
+                    )
                     """,
-                    edges=edges_to_create,
+                    project_id=project_id,
+                    nodes=nodes_to_update[i : i + batch_size],
                 )
 
+            loader = GraphBulkLoader(self.driver)
+            loader.load_nodes(nodes_to_create)
+            loader.load_edges(edges_to_create)
+
             end_time = time.time()
             logging.info(
-                f"Time taken to create graph and search index: {end_time - start_time:.2f} seconds"
+                f"Time taken to patch graph incrementally: {end_time - start_time:.2f} seconds"
             )
 
+        search_service = SearchService(self.db)
+        search_service.delete_node_indices(project_id, removed_ids)
+        # Nodes sent for inference are re-indexed with it
+        inference_set = set(inference_ids)
+        search_service.replace_node_indices(
+            project_id,
+            [
+                {
+                    "project_id": project_id,
+                    "node_id": node["node_id"],
+                    "name": node["name"],
+                    "file_path": node["file_path"],
+                    "content": f"{node['name']} {node['file_path']}",
+                }
+                for node in moved_nodes
+                if node["node_id"] not in inference_set
+                and node.get("name")
+                and node.get("file_path")
+            ],
+        )
+
+        return inference_ids, self._referenced_texts(
+            nx_graph, [new_nodes[node_id] for node_id in inference_ids], user_id
+        )
+
+    @staticmethod
+    def _referenced_texts(nx_graph, nodes: List[Dict], user_id: str) -> Dict[str, str]:
+        """Text of the nodes outside of the given ones that their text references."""
+        node_ids = {node["node_id"] for node in nodes}
+        referenced = {
+            node_id
+            for node in nodes
+            for node_id in REFERENCE_PATTERN.findall(node.get("text") or "")
+            if node_id not in node_ids
+        }
+        if not referenced:
+            return {}
+        texts = {}
+        for graph_node_id, node_data in nx_graph.nodes(data=True):
+            node_id = CodeGraphService.generate_node_id(graph_node_id, user_id)
+            if node_id in referenced and node_data.get("text"):
+                texts[node_id] = node_data["text"]
+        return texts
+
     def cleanup_graph(self, project_id: str):
         with self.driver.session() as session:
             session.run(
@@ -0,0 +1,229 @@
+import csv
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.modules.parsing.graph_construction.graph_bulk_loader import (
+    IDENTIFIER_PATTERN,
+    GraphBulkLoader,
+)
+
+logger = logging.getLogger(__name__)
+
+NODE_COLUMNS = [
+    "node_id",
+    "repoId",
+    "entityId",
+    "name",
+    "file_path",
+    "start_line",
+    "end_line",
+    "type",
+    "text",
+    "text_hash",
+]
+EDGE_COLUMNS = ["source_id", "target_id", "repoId"]
+
+# Neo4j's legacy CSV quote escaping reads \" as an escaped quote, so backslashes
+# are swapped for a private-use character in the file and restored in Cypher
+BACKSLASH_SENTINEL = "\ue000"
+
+
+class GraphCsvImporter:
+    """
+    Bulk import path for projects without an existing graph.
+
+    Nodes and relationships are written to CSV files in a directory the Neo4j
+    server can read (its import directory) and loaded server-side with LOAD CSV
+    in periodic-commit batches, so no row goes through a Cypher UNWIND payload.
+    Rows that cannot be represented safely in the files fall back to the
+    transactional GraphBulkLoader.
+    """
+
+    def __init__(
+        self,
+        driver,
+        import_dir: str,
+        import_url_prefix: str = "file:///",
+        rows_per_transaction: int = 10000,
+    ):
+        self.driver = driver
+        self.import_dir = import_dir
+        self.import_url_prefix = import_url_prefix
+        self.rows_per_transaction = rows_per_transaction
+
+    @classmethod
+    def from_env(cls, driver) -> Optional["GraphCsvImporter"]:
+        """Return an importer when NEO4J_IMPORT_DIR is configured, else None."""
+        import_dir = os.getenv("NEO4J_IMPORT_DIR")
+        if not import_dir:
+            return None
+        return cls(
+            driver,
+            import_dir,
+            os.getenv("NEO4J_IMPORT_URL_PREFIX", "file:///"),
+            int(os.getenv("NEO4J_IMPORT_ROWS_PER_TRANSACTION", 10000)),
+        )
+
+    def import_graph(
+        self, project_id: str, nodes: Iterable[Dict], edges: Iterable[Dict]
+    ) -> Tuple[int, int]:
+        start_time = time.time()
+        project_dir = os.path.join(self.import_dir, str(project_id))
+        os.makedirs(project_dir, exist_ok=True)
+        loader = GraphBulkLoader(self.driver)
+        loader.create_indices()
+
+        try:
+            node_files, fallback_nodes = self._write_nodes(project_dir, nodes)
+            edge_files, fallback_edges = self._write_edges(project_dir, edges)
+
+            node_count = 0
+            with self.driver.session() as session:
+                for labels, file_name, rows in node_files:
+                    session.run(
+                        self._node_query(labels, self._file_url(project_id, file_name)),
+                        labels=list(labels),
+                        sentinel=BACKSLASH_SENTINEL,
+                    ).consume()
+                    node_count += rows
+            node_count += loader.load_nodes(fallback_nodes)
+
+            edge_count = 0
+            with self.driver.session() as session:
+                for rel_type, file_name, rows in edge_files:
+                    session.run(
+                        self._edge_query(
+                            rel_type, self._file_url(project_id, file_name)
+                        )
+                    ).consume()
+                    edge_count += rows
+            edge_count += loader.load_edges(fallback_edges)
+        finally:
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+        elapsed = time.time() - start_time
+        logger.info(
+            f"Bulk imported {node_count} nodes and {edge_count} edges for project {project_id} "
+            f"in {elapsed:.2f} seconds ({len(fallback_nodes)} nodes, {len(fallback_edges)} edges "
+            f"loaded transactionally)"
+        )
+        return node_count, edge_count
+
+    def _write_nodes(
+        self, project_dir: str, nodes: Iterable[Dict]
+    ) -> Tuple[List[Tuple[Tuple[str, ...], str, int]], List[Dict]]:
+        writers = {}
+        files = {}
+        counts = {}
+        fallback_nodes = []
+        try:
+            for node in nodes:
+                labels = tuple(node["labels"])
+                text = node.get("text") or ""
+                if BACKSLASH_SENTINEL in text or not all(
+                    IDENTIFIER_PATTERN.match(label) for label in labels
+                ):
+                    fallback_nodes.append(node)
+                    continue
+                if labels not in writers:
+                    file_name = f"nodes_{'_'.join(labels)}.csv"
+                    files[labels] = open(
+                        os.path.join(project_dir, file_name),
+                        "w",
+                        newline="",
+                        encoding="utf-8",
+                    )
+                    writers[labels] = csv.DictWriter(
+                        files[labels], fieldnames=NODE_COLUMNS, extrasaction="ignore"
+                    )
+                    writers[labels].writeheader()
+                    counts[labels] = 0
+                writers[labels].writerow(
+                    {**node, "text": text.replace("\\", BACKSLASH_SENTINEL)}
+                )
+                counts[labels] += 1
+        finally:
+            for file in files.values():
+                file.close()
+
+        node_files = [
+            (labels, os.path.basename(files[labels].name), counts[labels])
+            for labels in writers
+        ]
+        return node_files, fallback_nodes
+
+    def _write_edges(
+        self, project_dir: str, edges: Iterable[Dict]
+    ) -> Tuple[List[Tuple[str, str, int]], List[Dict]]:
+        writers = {}
+        files = {}
+        counts = {}
+        fallback_edges = []
+        try:
+            for edge in edges:
+                rel_type = edge["type"]
+                if not IDENTIFIER_PATTERN.match(rel_type):
+                    fallback_edges.append(edge)
+                    continue
+                if rel_type not in writers:
+                    file_name = f"edges_{rel_type}.csv"
+                    files[rel_type] = open(
+                        os.path.join(project_dir, file_name),
+                        "w",
+                        newline="",
+                        encoding="utf-8",
+                    )
+                    writers[rel_type] = csv.DictWriter(
+                        files[rel_type], fieldnames=EDGE_COLUMNS, extrasaction="ignore"
+                    )
+                    writers[rel_type].writeheader()
+                    counts[rel_type] = 0
+                writers[rel_type].writerow(edge)
+                counts[rel_type] += 1
+        finally:
+            for file in files.values():
+                file.close()
+
+        edge_files = [
+            (rel_type, os.path.basename(files[rel_type].name), counts[rel_type])
+            for rel_type in writers
+        ]
+        return edge_files, fallback_edges
+
+    def _file_url(self, project_id: str, file_name: str) -> str:
+        return f"{self.import_url_prefix}{project_id}/{file_name}"
+
+    def _node_query(self, labels: Tuple[str, ...], file_url: str) -> str:
+        return f"""
+        LOAD CSV WITH HEADERS FROM '{file_url}' AS row
+        CALL {{
+            WITH row
+            CREATE (n:{":".join(labels)} {{
+                node_id: row.node_id,
+                repoId: row.repoId,
+                entityId: row.entityId,
+                name: row.name,
+                file_path: row.file_path,
+                start_line: toInteger(row.start_line),
+                end_line: toInteger(row.end_line),
+                type: row.type,
+                text: replace(row.text, $sentinel, '\\\\'),
+                text_hash: row.text_hash,
+                labels: $labels
+            }})
+        }} IN TRANSACTIONS OF {self.rows_per_transaction} ROWS
+        """
+
+    def _edge_query(self, rel_type: str, file_url: str) -> str:
+        return f"""
+        LOAD CSV WITH HEADERS FROM '{file_url}' AS row
+        CALL {{
+            WITH row
+            MATCH (source:NODE {{node_id: row.source_id, repoId: row.repoId}})
+            MATCH (target:NODE {{node_id: row.target_id, repoId: row.repoId}})
+            CREATE (source)-[:{rel_type} {{repoId: row.repoId}}]->(target)
+        }} IN TRANSACTIONS OF {self.rows_per_transaction} ROWS
+        """
@@ -0,0 +1,154 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_GRAPH_BATCH_SIZE = int(os.getenv("DUPLICATE_GRAPH_BATCH_SIZE", 5000))
+DUPLICATE_GRAPH_ATTEMPTS = int(os.getenv("DUPLICATE_GRAPH_ATTEMPTS", 3))
+# How often copy progress is logged while a phase runs
+DUPLICATE_GRAPH_PROGRESS_SECONDS = float(
+    os.getenv("DUPLICATE_GRAPH_PROGRESS_SECONDS", 5)
+)
+
+# Only properties describing the code and its inference results are copied,
+# properties tied to the source project such as entityId are not carried over
+COPY_NODES_QUERY = """
+CALL apoc.periodic.iterate(
+    "MATCH (n:NODE {repoId: $old_repo_id})
+     WHERE NOT EXISTS { MATCH (:NODE {repoId: $new_repo_id, node_id: n.node_id}) }
+     RETURN n",
+    "CALL apoc.create.node(labels(n), apoc.map.clean(n {
+         .node_id, .name, .type, .file_path, .start_line, .end_line, .text,
+         .text_hash, .signature, .docstring, .tags, .embedding,
+         repoId: $new_repo_id
+     }, [], [null]))
+     YIELD node
+     RETURN count(node)",
+    {batchSize: $batch_size, parallel: false,
+     params: {old_repo_id: $old_repo_id, new_repo_id: $new_repo_id}}
+)
+YIELD total, batches, failedBatches, errorMessages
+RETURN total, batches, failedBatches, errorMessages
+"""
+
+# All outgoing relationships of a start node are created in the same batch, so a
+# copied node that already has outgoing relationships is skipped on resume
+COPY_RELATIONSHIPS_QUERY = """
+CALL apoc.periodic.iterate(
+    "MATCH (n:NODE {repoId: $old_repo_id})
+     WHERE EXISTS { MATCH (n)-->(:NODE) }
+     MATCH (c:NODE {repoId: $new_repo_id, node_id: n.node_id})
+     WHERE NOT EXISTS { MATCH (c)-->() }
+     RETURN n, c",
+    "MATCH (n)-[r]->(m:NODE)
+     MATCH (b:NODE {repoId: $new_repo_id, node_id: m.node_id})
+     CALL apoc.create.relationship(c, type(r), {repoId: $new_repo_id}, b) YIELD rel
+     RETURN count(rel)",
+    {batchSize: $batch_size, parallel: false,
+     params: {old_repo_id: $old_repo_id, new_repo_id: $new_repo_id}}
+)
+YIELD total, batches, failedBatches, errorMessages
+RETURN total, batches, failedBatches, errorMessages
+"""
+
+COUNT_NODES_QUERY = "MATCH (n:NODE {repoId: $repo_id}) RETURN count(n) AS count"
+COUNT_RELATIONSHIPS_QUERY = (
+    "MATCH (:NODE {repoId: $repo_id})-[r]->(:NODE) RETURN count(r) AS count"
+)
+
+
+class GraphDuplicator:
+    """
+    Copies a project's graph to a new repoId inside Neo4j.
+
+    Nodes, with their labels and code properties, and then relationships are
+    cloned under the new repoId by apoc.periodic.iterate in committed batches,
+    so nothing crosses the wire. Each phase only picks up what is not copied
+    yet, a failed copy is resumed by running it again. Progress is logged
+    while a phase runs.
+    """
+
+    def __init__(self, driver, batch_size: int = DUPLICATE_GRAPH_BATCH_SIZE):
+        self.driver = driver
+        self.batch_size = batch_size
+
+    def duplicate(self, old_repo_id: str, new_repo_id: str) -> Tuple[int, int]:
+        """Copy the graph, retrying failed phases from where they stopped."""
+        for attempt in range(1, DUPLICATE_GRAPH_ATTEMPTS + 1):
+            try:
+                nodes = self._run_phase(
+                    "nodes",
+                    COPY_NODES_QUERY,
+                    COUNT_NODES_QUERY,
+                    old_repo_id,
+                    new_repo_id,
+                )
+                relationships = self._run_phase(
+                    "relationships",
+                    COPY_RELATIONSHIPS_QUERY,
+                    COUNT_RELATIONSHIPS_QUERY,
+                    old_repo_id,
+                    new_repo_id,
+                )
+                return nodes, relationships
+            except Exception as e:
+                if attempt == DUPLICATE_GRAPH_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"Duplicating graph {old_repo_id} to {new_repo_id} failed on "
+                    f"attempt {attempt}, resuming: {e}"
+                )
+
+    def _run_phase(
+        self,
+        phase: str,
+        copy_query: str,
+        count_query: str,
+        old_repo_id: str,
+        new_repo_id: str,
+    ) -> int:
+        start_time = time.time()
+        total = self._count(count_query, old_repo_id)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(
+                self._run_single,
+                copy_query,
+                old_repo_id=old_repo_id,
+                new_repo_id=new_repo_id,
+                batch_size=self.batch_size,
+            )
+            while True:
+                try:
+                    result = future.result(timeout=DUPLICATE_GRAPH_PROGRESS_SECONDS)
+                    break
+                except FutureTimeoutError:
+                    copied = self._count(count_query, new_repo_id)
+                    logger.info(
+                        f"Duplicating graph {old_repo_id} to {new_repo_id}: "
+                        f"{copied}/{total} {phase} copied"
+                    )
+
+        if result["failedBatches"]:
+            raise RuntimeError(
+                f"{result['failedBatches']} of {result['batches']} batches failed "
+                f"copying {phase}: {result['errorMessages']}"
+            )
+        copied = self._count(count_query, new_repo_id)
+        logger.info(
+            f"Duplicated {copied}/{total} {phase} from {old_repo_id} to {new_repo_id} "
+            f"in {time.time() - start_time:.2f} seconds"
+        )
+        return copied
+
+    def _run_single(self, query: str, **params) -> Dict:
+        with self.driver.session() as session:
+            return session.run(query, **params).single().data()
+
+    def _count(self, query: str, repo_id: str) -> int:
+        with self.driver.session() as session:
+            return session.run(query, repo_id=repo_id).single()["count"]
@@ -162,6 +162,8 @@ class ParsingController:
 
                 if not is_latest or project.status != ProjectStatusEnum.READY.value:
                     cleanup_graph = True
+                    # A ready project only moved to a newer commit, patch its graph
+                    incremental = project.status == ProjectStatusEnum.READY.value
                     logger.info(
                         f"Submitting parsing task for existing project {project_id}"
                     )
@@ -171,6 +173,7 @@ class ParsingController:
                         user_email,
                         project_id,
                         cleanup_graph,
+                        incremental,
                     )
 
                     await project_manager.update_project_status(
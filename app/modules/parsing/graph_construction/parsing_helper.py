@@ -3,7 +3,7 @@ import logging
 import os
 import shutil
 import tarfile
-from typing import Any, Tuple
+from typing import Any, Optional, Set, Tuple
 
 import requests
 from fastapi import HTTPException
@@ -17,6 +17,9 @@ from app.modules.projects.projects_service import ProjectService
 
 logger = logging.getLogger(__name__)
 
+# GitHub's compare API lists at most 300 changed files
+GITHUB_COMPARE_FILE_LIMIT = 300
+
 
 class ParsingServiceError(Exception):
     """Base exception class for ParsingService errors."""
@@ -454,6 +457,69 @@ class ParseHelper:
 
         return metadata
 
+    @staticmethod
+    def get_changed_files(
+        repo, base_commit: str, head_commit: str
+    ) -> Optional[Tuple[Set[str], Set[str]]]:
+        """
+        Compute the files touched between two commits of a repository.
+
+        Args:
+            repo: A local git.Repo or a PyGithub Repository.
+            base_commit (str): The commit the existing graph was built from.
+            head_commit (str): The commit being parsed now.
+        Returns:
+            A (changed_files, deleted_files) tuple of repository-relative paths,
+            or None when the diff cannot be determined and a full parse is needed.
+        """
+        if not base_commit or not head_commit:
+            return None
+
+        changed_files = set()
+        deleted_files = set()
+
+        try:
+            if isinstance(repo, Repo):
+                diff = repo.git.diff(
+                    "--name-status", "-M", f"{base_commit}..{head_commit}"
+                )
+                for line in diff.splitlines():
+                    parts = line.split("\t")
+                    if len(parts) < 2:
+                        continue
+                    status = parts[0]
+                    if status.startswith("R"):
+                        deleted_files.add(parts[1])
+                        changed_files.add(parts[2])
+                    elif status.startswith("D"):
+                        deleted_files.add(parts[1])
+                    else:
+                        changed_files.add(parts[-1])
+            else:
+                comparison = repo.compare(base_commit, head_commit)
+                files = list(comparison.files)
+                # The compare API truncates the file list, a partial diff is unusable
+                if len(files) >= GITHUB_COMPARE_FILE_LIMIT:
+                    logger.info(
+                        f"Diff {base_commit}..{head_commit} touches too many files for an incremental parse"
+                    )
+                    return None
+                for file in files:
+                    if file.status == "removed":
+                        deleted_files.add(file.filename)
+                    elif file.status == "renamed":
+                        deleted_files.add(file.previous_filename)
+                        changed_files.add(file.filename)
+                    else:
+                        changed_files.add(file.filename)
+        except Exception as e:
+            logger.error(
+                f"Error computing diff between {base_commit} and {head_commit}: {e}"
+            )
+            return None
+
+        return changed_files, deleted_files
+
     async def check_commit_status(self, project_id: str) -> bool:
         """
         Check if the current commit ID of the project matches the latest commit ID from the repository.
@@ -6,22 +6,52 @@ from collections import Counter, defaultdict, namedtuple
 from pathlib import Path
 
 import networkx as nx
+from billiard.exceptions import WorkerLostError
+from billiard.pool import Pool
 from grep_ast import TreeContext, filename_to_lang
 from pygments.lexers import guess_lexer_for_filename
 from pygments.token import Token
 from pygments.util import ClassNotFound
 from tqdm import tqdm
-from tree_sitter_languages import get_language, get_parser
+from tree_sitter_languages import get_language
 
 from app.core.database import get_db
 from app.modules.parsing.graph_construction.parsing_helper import (  # noqa: E402
     ParseHelper,
 )
+from app.modules.parsing.graph_construction.parsing_tags_cache import (
+    TagsCache,
+    get_cached_parser,
+    get_cached_query,
+)
 
 # tree_sitter is throwing a FutureWarning
 warnings.simplefilter("ignore", category=FutureWarning)
 Tag = namedtuple("Tag", "rel_fname fname line end_line name kind type".split())
 
+# Below this many files the process pool start-up costs more than it saves
+PARALLEL_PARSE_MIN_FILES = 200
+
+# Process-local state of parse pool workers, set by _init_parse_worker
+_worker_io = None
+_worker_tags_cache = None
+
+
+def _init_parse_worker(io, tags_cache_dir):
+    global _worker_io, _worker_tags_cache
+    _worker_io = io
+    _worker_tags_cache = TagsCache(tags_cache_dir)
+
+
+def _parse_file_worker(repo_file):
+    file_path, rel_path = repo_file
+    text = _worker_io.read_text(file_path) or ""
+    tags = RepoMap.extract_tags(_worker_tags_cache, file_path, rel_path, text)
+    # Only the tag fields are sent back, file names are re-attached by the parent
+    return text, [
+        (tag.line, tag.end_line, tag.name, tag.kind, tag.type) for tag in tags
+    ]
+
 
 class RepoMap:
     # Parsing logic adapted from aider (https://github.com/paul-gauthier/aider)
@@ -51,6 +81,7 @@ class RepoMap:
 
         self.repo_content_prefix = repo_content_prefix
         self.parse_helper = ParseHelper(next(get_db()))
+        self.tags_cache = TagsCache()
 
     def get_repo_map(
         self, chat_files, other_files, mentioned_fnames=None, mentioned_idents=None
@@ -120,6 +151,7 @@ class RepoMap:
         return [path + ":"]
 
     def save_tags_cache(self):
+        # Entries are persisted as they are computed in get_tags
         pass
 
     def get_mtime(self, fname):
@@ -128,36 +160,65 @@ class RepoMap:
         except FileNotFoundError:
             self.io.tool_error(f"File not found error: {fname}")
 
-    def get_tags(self, fname, rel_fname):
-        # Check if the file is in the cache and if the modification time has not changed
+    def get_tags(self, fname, rel_fname, code=None):
         file_mtime = self.get_mtime(fname)
         if file_mtime is None:
             return []
 
-        data = list(self.get_tags_raw(fname, rel_fname))
+        if code is None:
+            code = self.io.read_text(fname)
+        return RepoMap.extract_tags(self.tags_cache, fname, rel_fname, code)
+
+    @staticmethod
+    def extract_tags(tags_cache, fname, rel_fname, code):
+        lang = filename_to_lang(fname)
+        if not lang:
+            return []
+        query, query_version = get_cached_query(lang)
+        if not query:
+            return []
+
+        if not code:
+            return []
+
+        # Tags are cached by content, so unchanged files skip tree-sitter entirely
+        key = TagsCache.make_key(lang, code, query_version)
+        cached = tags_cache.get(key)
+        if cached is not None:
+            return [
+                Tag(rel_fname, fname, line, end_line, name, kind, type)
+                for line, end_line, name, kind, type in cached
+            ]
+
+        data = list(RepoMap.parse_tags(fname, rel_fname, code))
+        tags_cache.set(
+            key,
+            [(tag.line, tag.end_line, tag.name, tag.kind, tag.type) for tag in data],
+        )
 
         return data
 
-    def get_tags_raw(self, fname, rel_fname):
+    def get_tags_raw(self, fname, rel_fname, code=None):
+        if code is None:
+            code = self.io.read_text(fname)
+        return RepoMap.parse_tags(fname, rel_fname, code)
+
+    @staticmethod
+    def parse_tags(fname, rel_fname, code):
         lang = filename_to_lang(fname)
         if not lang:
             return
 
-        language = get_language(lang)
-        parser = get_parser(lang)
-
-        query_scm = get_scm_fname(lang)
-        if not query_scm.exists():
+        query, _ = get_cached_query(lang)
+        if not query:
             return
-        query_scm = query_scm.read_text()
+        parser = get_cached_parser(lang)
 
-        code = self.io.read_text(fname)
         if not code:
             return
         tree = parser.parse(bytes(code, "utf-8"))
 
         # Run the tags queries
-        query = language.query(query_scm)
         captures = query.captures(tree.root_node)
         captures = list(captures)
         saw = set()
@@ -229,20 +290,16 @@ class RepoMap:
         if not lang:
             return
 
-        language = get_language(lang)
-        parser = get_parser(lang)
-
-        query_scm = get_scm_fname(lang)
-        if not query_scm.exists():
+        query, _ = get_cached_query(lang)
+        if not query:
             return
-        query_scm = query_scm.read_text()
+        parser = get_cached_parser(lang)
 
         if not code:
             return
         tree = parser.parse(bytes(code, "utf-8"))
 
         # Run the tags queries
-        query = language.query(query_scm)
         captures = query.captures(tree.root_node)
 
         captures = list(captures)
@@ -579,130 +636,187 @@ class RepoMap:
 
         return False
 
-    def create_graph(self, repo_dir):
-        G = nx.MultiDiGraph()
-        defines = defaultdict(set)
-        references = defaultdict(set)
-        seen_relationships = set()
-
+    def list_repo_files(self, repo_dir):
+        repo_files = []
         for root, dirs, files in os.walk(repo_dir):
             if any(part.startswith(".") for part in root.split(os.sep)):
                 continue
 
             for file in files:
                 file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, repo_dir)
-
                 if not self.parse_helper.is_text_file(file_path):
                     continue
+                repo_files.append((file_path, os.path.relpath(file_path, repo_dir)))
+
+        # Sorted so sequential and parallel parses build identical graphs
+        return sorted(repo_files, key=lambda item: item[1])
+
+    def parse_files(self, repo_files, workers=None):
+        """
+        Yield (rel_path, text, tags) for every file, in the order of repo_files.
+
+        With more than one worker, tag extraction is fanned out to a process pool
+        and results are streamed back in order as compact tuples. The pool is
+        billiard's, which unlike multiprocessing can be started from the
+        daemonic prefork processes of a Celery worker.
+        """
+        if workers is None:
+            workers = int(os.getenv("PARSING_WORKERS", os.cpu_count() or 1))
+
+        parsed = 0
+        if workers > 1 and len(repo_files) >= PARALLEL_PARSE_MIN_FILES:
+            pool = None
+            try:
+                pool = Pool(
+                    processes=workers,
+                    initializer=_init_parse_worker,
+                    initargs=(self.io, self.tags_cache.cache_dir),
+                )
+                chunksize = max(1, len(repo_files) // (workers * 8))
+                results = pool.imap(_parse_file_worker, repo_files, chunksize=chunksize)
+                for (file_path, rel_path), (text, tags) in zip(repo_files, results):
+                    yield rel_path, text, [
+                        Tag(rel_path, file_path, *tag) for tag in tags
+                    ]
+                    parsed += 1
+                pool.close()
+                pool.join()
+                pool = None
+                return
+            except (OSError, WorkerLostError) as e:
+                logging.warning(
+                    f"Parallel parsing stopped after {parsed} files ({e}), continuing sequentially"
+                )
+            finally:
+                if pool is not None:
+                    pool.terminate()
+
+        for file_path, rel_path in repo_files[parsed:]:
+            text = self.io.read_text(file_path) or ""
+            yield rel_path, text, self.get_tags(file_path, rel_path, text)
+
+    def create_graph(self, repo_dir, workers=None):
+        G = nx.MultiDiGraph()
+        defines = defaultdict(set)
+        references = defaultdict(set)
+        seen_relationships = set()
 
-                logging.info(f"\nProcessing file: {rel_path}")
-
-                # Add file node
-                file_node_name = rel_path
-                if not G.has_node(file_node_name):
-                    G.add_node(
-                        file_node_name,
-                        file=rel_path,
-                        type="FILE",
-                        text=self.io.read_text(file_path) or "",
-                        line=0,
-                        end_line=0,
-                        name=rel_path.split("/")[-1],
-                    )
+        repo_files = self.list_repo_files(repo_dir)
+        for rel_path, text, tags in self.parse_files(repo_files, workers):
+            logging.info(f"\nProcessing file: {rel_path}")
+
+            # Add file node
+            file_node_name = rel_path
+            if not G.has_node(file_node_name):
+                G.add_node(
+                    file_node_name,
+                    file=rel_path,
+                    type="FILE",
+                    text=text,
+                    line=0,
+                    end_line=0,
+                    name=rel_path.split("/")[-1],
+                )
+
+            current_class = None
+            current_method = None
+
+            # Process all tags in file
+            for tag in tags:
+                if tag.kind == "def":
+                    if tag.type == "class":
+                        node_type = "CLASS"
+                        current_class = tag.name
+                        current_method = None
+                    elif tag.type == "interface":
+                        node_type = "INTERFACE"
+                        current_class = tag.name
+                        current_method = None
+                    elif tag.type in ["method", "function"]:
+                        node_type = "FUNCTION"
+                        current_method = tag.name
+                    else:
+                        continue
 
-                current_class = None
-                current_method = None
-
-                # Process all tags in file
-                for tag in self.get_tags(file_path, rel_path):
-                    if tag.kind == "def":
-                        if tag.type == "class":
-                            node_type = "CLASS"
-                            current_class = tag.name
-                            current_method = None
-                        elif tag.type == "interface":
-                            node_type = "INTERFACE"
-                            current_class = tag.name
-                            current_method = None
-                        elif tag.type in ["method", "function"]:
-                            node_type = "FUNCTION"
-                            current_method = tag.name
-                        else:
-                            continue
-
-                        # Create fully qualified node name
-                        if current_class:
-                            node_name = f"{rel_path}:{current_class}.{tag.name}"
-                        else:
-                            node_name = f"{rel_path}:{tag.name}"
-
-                        # Add node
-                        if not G.has_node(node_name):
-                            G.add_node(
+                    # Create fully qualified node name
+                    if current_class:
+                        node_name = f"{rel_path}:{current_class}.{tag.name}"
+                    else:
+                        node_name = f"{rel_path}:{tag.name}"
+
+                    # Add node
+                    if not G.has_node(node_name):
+                        G.add_node(
+                            node_name,
+                            file=rel_path,
+                            line=tag.line,
+                            end_line=tag.end_line,
+                            type=node_type,
+                            name=tag.name,
+                            class_name=current_class,
+                        )
+
+                        # Add CONTAINS relationship from file
+                        rel_key = (file_node_name, node_name, "CONTAINS")
+                        if rel_key not in seen_relationships:
+                            G.add_edge(
+                                file_node_name,
                                 node_name,
-                                file=rel_path,
-                                line=tag.line,
-                                end_line=tag.end_line,
-                                type=node_type,
-                                name=tag.name,
-                                class_name=current_class,
+                                type="CONTAINS",
+                                ident=tag.name,
                             )
+                            seen_relationships.add(rel_key)
 
-                            # Add CONTAINS relationship from file
-                            rel_key = (file_node_name, node_name, "CONTAINS")
-                            if rel_key not in seen_relationships:
-                                G.add_edge(
-                                    file_node_name,
-                                    node_name,
-                                    type="CONTAINS",
-                                    ident=tag.name,
-                                )
-                                seen_relationships.add(rel_key)
-
-                        # Record definition
-                        defines[tag.name].add(node_name)
-
-                    elif tag.kind == "ref":
-                        # Handle references
-                        if current_class and current_method:
-                            source = f"{rel_path}:{current_class}.{current_method}"
-                        elif current_method:
-                            source = f"{rel_path}:{current_method}"
-                        else:
-                            source = rel_path
-
-                        references[tag.name].add(
-                            (
-                                source,
-                                tag.line,
-                                tag.end_line,
-                                current_class,
-                                current_method,
-                            )
+                    # Record definition
+                    defines[tag.name].add(node_name)
+
+                elif tag.kind == "ref":
+                    # Handle references
+                    if current_class and current_method:
+                        source = f"{rel_path}:{current_class}.{current_method}"
+                    elif current_method:
+                        source = f"{rel_path}:{current_method}"
+                    else:
+                        source = rel_path
+
+                    references[tag.name].add(
+                        (
+                            source,
+                            tag.line,
+                            tag.end_line,
+                            current_class,
+                            current_method,
                         )
+                    )
 
-        for ident, refs in references.items():
-            target_nodes = defines.get(ident, set())
+        # Resolve in sorted order, set iteration order depends on hash seeds
+        for ident in sorted(references):
+            target_nodes = sorted(
+                target for target in defines.get(ident, ()) if G.has_node(target)
+            )
+            if not target_nodes:
+                continue
 
+            refs = sorted(references[ident], key=lambda ref: (ref[0], ref[1], ref[2]))
             for source, line, end_line, src_class, src_method in refs:
+                if not G.has_node(source):
+                    continue
                 for target in target_nodes:
                     if source == target:
                         continue
 
-                    if G.has_node(source) and G.has_node(target):
-                        RepoMap.create_relationship(
-                            G,
-                            source,
-                            target,
-                            "REFERENCES",
-                            seen_relationships,
-                            {
-                                "ident": ident,
-                                "ref_line": line,
-                                "end_ref_line": end_line,
-                            },
-                        )
+                    RepoMap.create_relationship(
+                        G,
+                        source,
+                        target,
+                        "REFERENCES",
+                        seen_relationships,
+                        {
+                            "ident": ident,
+                            "ref_line": line,
+                            "end_ref_line": end_line,
+                        },
+                    )
 
         return G
 
@@ -797,13 +911,3 @@ class RepoMap:
         output = "\n".join([line[:100] for line in output.splitlines()]) + "\n"
 
         return output
-
-
-def get_scm_fname(lang):
-    # Load the tags queries
-    try:
-        return Path(os.path.dirname(__file__)).joinpath(
-            "queries", f"tree-sitter-{lang}-tags.scm"
-        )
-    except KeyError:
-        return
@@ -1,9 +1,11 @@
+import asyncio
 import logging
 import os
 import shutil
 import traceback
 from asyncio import create_task
 from contextlib import contextmanager
+from typing import Set
 
 from blar_graph.db_managers import Neo4jManager
 from blar_graph.graph_construction.core.graph_builder import GraphConstructor
@@ -12,8 +14,10 @@ from git import Repo
 from sqlalchemy.orm import Session
 
 from app.core.config_provider import config_provider
+from app.modules.code_provider.blob_cache import BlobCache
 from app.modules.code_provider.code_provider_service import CodeProviderService
 from app.modules.parsing.graph_construction.code_graph_service import CodeGraphService
+from app.modules.parsing.graph_construction.graph_duplicator import GraphDuplicator
 from app.modules.parsing.graph_construction.parsing_helper import (
     ParseHelper,
     ParsingFailedError,
@@ -31,6 +35,9 @@ from .parsing_schema import ParsingRequest
 
 logger = logging.getLogger(__name__)
 
+# Languages whose graph is built by blar_graph's GraphConstructor
+BLAR_LANGUAGES = ["python", "javascript", "typescript"]
+
 
 class ParsingService:
     def __init__(self, db: Session, user_id: str):
@@ -57,25 +64,21 @@ class ParsingService:
         user_email: str,
         project_id: int,
         cleanup_graph: bool = True,
+        incremental: bool = False,
     ):
         project_manager = ProjectService(self.db)
         extracted_dir = None
         try:
-            if cleanup_graph:
-                neo4j_config = config_provider.get_neo4j_config()
-
-                try:
-                    code_graph_service = CodeGraphService(
-                        neo4j_config["uri"],
-                        neo4j_config["username"],
-                        neo4j_config["password"],
-                        self.db,
-                    )
+            previous_commit_id = None
+            if incremental:
+                # Read the parsed commit before setup_project_directory overwrites it
+                project = await self.project_service.get_project_from_db_by_id(
+                    project_id
+                )
+                previous_commit_id = project.get("commit_id") if project else None
 
-                    code_graph_service.cleanup_graph(project_id)
-                except Exception as e:
-                    logger.error(f"Error in cleanup_graph: {e}")
-                    raise HTTPException(status_code=500, detail="Internal server error")
+            if cleanup_graph and not previous_commit_id:
+                self.cleanup_project_graph(project_id)
 
             repo, owner, auth = await self.parse_helper.clone_or_copy_repository(
                 repo_details, user_id
@@ -109,9 +112,41 @@ class ParsingService:
                 else:
                     language = self.parse_helper.detect_repo_language(extracted_dir)
 
+            if previous_commit_id:
+                project = await self.project_service.get_project_from_db_by_id(
+                    project_id
+                )
+                # Only graphs built by RepoMap can be patched. Graphs of
+                # BLAR_LANGUAGES are built by blar_graph, whose node ids and
+                # reference stubs are not reproducible per file, so those
+                # projects are always parsed again in full
+                changed_files = None
+                if language in BLAR_LANGUAGES:
+                    logger.info(
+                        f"Parsing project {project_id}: Incremental parse is not supported for {language}"
+                    )
+                elif language != "other":
+                    changed_files = self.parse_helper.get_changed_files(
+                        repo, previous_commit_id, project.get("commit_id")
+                    )
+                if changed_files is not None:
+                    await self.analyze_directory_incremental(
+                        extracted_dir, project_id, user_id, user_email, *changed_files
+                    )
+                    self.store_repo_snapshot(extracted_dir, project_id)
+                    message = "The project has been parsed successfully"
+                    return {"message": message, "id": project_id}
+
+                logger.info(
+                    f"Parsing project {project_id}: Incremental parse unavailable, falling back to a full parse"
+                )
+                if cleanup_graph:
+                    self.cleanup_project_graph(project_id)
+
             await self.analyze_directory(
                 extracted_dir, project_id, user_id, self.db, language, user_email
             )
+            self.store_repo_snapshot(extracted_dir, project_id)
             message = "The project has been parsed successfully"
             return {"message": message, "id": project_id}
 
@@ -141,6 +176,67 @@ class ParsingService:
             ):
                 shutil.rmtree(extracted_dir, ignore_errors=True)
 
+    def store_repo_snapshot(self, extracted_dir: str, project_id: int):
+        """
+        Keep the parsed files in the blob cache's disk tier before the
+        downloaded snapshot is deleted, so code reads at this commit stay local.
+        """
+        blob_cache = BlobCache()
+        project_path = os.getenv("PROJECT_PATH")
+        if (
+            not blob_cache.cache_dir
+            or not project_path
+            or not extracted_dir.startswith(project_path)
+        ):
+            return
+
+        project = self.project_service.get_project_from_db_by_id_sync(project_id)
+        if not project or not project.get("commit_id"):
+            return
+
+        def read_files():
+            for root, _, files in os.walk(extracted_dir):
+                if any(part.startswith(".") for part in root.split(os.sep)):
+                    continue
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    if not self.parse_helper.is_text_file(file_path):
+                        continue
+                    try:
+                        with open(file_path, "r", encoding="utf-8") as f:
+                            text = f.read()
+                    except (OSError, UnicodeDecodeError):
+                        continue
+                    yield os.path.relpath(file_path, extracted_dir), text
+
+        try:
+            count = blob_cache.store_snapshot(
+                project["project_name"], project["commit_id"], read_files()
+            )
+            logger.info(
+                f"Parsing project {project_id}: Stored {count} files in the blob cache"
+            )
+        except Exception as e:
+            logger.warning(
+                f"Parsing project {project_id}: Failed to store repository snapshot: {e}"
+            )
+
+    def cleanup_project_graph(self, project_id: int):
+        neo4j_config = config_provider.get_neo4j_config()
+
+        try:
+            code_graph_service = CodeGraphService(
+                neo4j_config["uri"],
+                neo4j_config["username"],
+                neo4j_config["password"],
+                self.db,
+            )
+
+            code_graph_service.cleanup_graph(project_id)
+        except Exception as e:
+            logger.error(f"Error in cleanup_graph: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
     def create_neo4j_indices(self, graph_manager):
         # Create existing indices from blar_graph
         graph_manager.create_entityId_index()
@@ -160,6 +256,12 @@ class ParsingService:
                 """
             session.run(name_repo_query)
 
+            # Composite index for repo_id and file_path, used by per-file lookups
+            file_path_repo_query = """
+                CREATE INDEX repo_id_file_path_NODE IF NOT EXISTS FOR (n:NODE) ON (n.repoId, n.file_path)
+                """
+            session.run(file_path_repo_query)
+
             # New index for relationship types - using correct Neo4j syntax
             rel_type_query = """
                 CREATE LOOKUP INDEX relationship_type_lookup IF NOT EXISTS FOR ()-[r]->() ON EACH type(r)
@@ -188,7 +290,7 @@ class ParsingService:
             logger.error(f"Project with ID {project_id} not found.")
             raise HTTPException(status_code=404, detail="Project not found.")
 
-        if language in ["python", "javascript", "typescript"]:
+        if language in BLAR_LANGUAGES:
             graph_manager = Neo4jManager(project_id, user_id)
             self.create_neo4j_indices(
                 graph_manager
@@ -247,7 +349,10 @@ class ParsingService:
                     db,
                 )
 
-                service.create_and_store_graph(extracted_dir, project_id, user_id)
+                # The graph was cleaned up or never existed, so bulk import applies
+                service.create_and_store_graph(
+                    extracted_dir, project_id, user_id, bulk_import=True
+                )
 
                 await self.project_service.update_project_status(
                     project_id, ProjectStatusEnum.PARSED
@@ -279,86 +384,67 @@ class ParsingService:
                 "Repository doesn't consist of a language currently supported."
             )
 
+    async def analyze_directory_incremental(
+        self,
+        extracted_dir: str,
+        project_id: int,
+        user_id: str,
+        user_email: str,
+        changed_files: Set[str],
+        deleted_files: Set[str],
+    ):
+        logger.info(
+            f"Parsing project {project_id}: Incrementally analyzing {len(changed_files)} changed "
+            f"and {len(deleted_files)} deleted files in {extracted_dir}"
+        )
+        project_details = await self.project_service.get_project_from_db_by_id(
+            project_id
+        )
+        if not project_details:
+            logger.error(f"Project with ID {project_id} not found.")
+            raise HTTPException(status_code=404, detail="Project not found.")
+
+        neo4j_config = config_provider.get_neo4j_config()
+        service = CodeGraphService(
+            neo4j_config["uri"],
+            neo4j_config["username"],
+            neo4j_config["password"],
+            self.db,
+        )
+        try:
+            node_ids, node_texts = service.update_graph_incremental(
+                extracted_dir, project_id, user_id, changed_files, deleted_files
+            )
+            await self.project_service.update_project_status(
+                project_id, ProjectStatusEnum.PARSED
+            )
+            if node_ids:
+                await self.inference_service.run_inference(
+                    project_id, node_ids, node_texts
+                )
+            self.inference_service.log_graph_stats(project_id)
+            await self.project_service.update_project_status(
+                project_id, ProjectStatusEnum.READY
+            )
+            create_task(
+                EmailHelper().send_email(
+                    user_email,
+                    project_details.get("project_name"),
+                    project_details.get("branch_name"),
+                )
+            )
+        finally:
+            service.close()
+
     async def duplicate_graph(self, old_repo_id: str, new_repo_id: str):
         await self.search_service.clone_search_indices(old_repo_id, new_repo_id)
-        node_batch_size = 3000  # Fixed batch size for nodes
-        relationship_batch_size = 3000  # Fixed batch size for relationships
         try:
-            # Step 1: Fetch and duplicate nodes in batches
-            with self.inference_service.driver.session() as session:
-                offset = 0
-                while True:
-                    nodes_query = """
-                    MATCH (n:NODE {repoId: $old_repo_id})
-                    RETURN n.node_id AS node_id, n.text AS text, n.file_path AS file_path,
-                           n.start_line AS start_line, n.end_line AS end_line, n.name AS name,
-                           COALESCE(n.docstring, '') AS docstring,
-                           COALESCE(n.embedding, []) AS embedding,
-                           labels(n) AS labels
-                    SKIP $offset LIMIT $limit
-                    """
-                    nodes_result = session.run(
-                        nodes_query,
-                        old_repo_id=old_repo_id,
-                        offset=offset,
-                        limit=node_batch_size,
-                    )
-                    nodes = [dict(record) for record in nodes_result]
-
-                    if not nodes:
-                        break
-
-                    # Insert nodes under the new repo ID, preserving labels, docstring, and embedding
-                    create_query = """
-                    UNWIND $batch AS node
-                    CALL apoc.create.node(node.labels, {
-                        repoId: $new_repo_id,
-                        node_id: node.node_id,
-                        text: node.text,
-                        file_path: node.file_path,
-                        start_line: node.start_line,
-                        end_line: node.end_line,
-                        name: node.name,
-                        docstring: node.docstring,
-                        embedding: node.embedding
-                    }) YIELD node AS new_node
-                    RETURN new_node
-                    """
-                    session.run(create_query, new_repo_id=new_repo_id, batch=nodes)
-                    offset += node_batch_size
-
-            # Step 2: Fetch and duplicate relationships in batches
-            with self.inference_service.driver.session() as session:
-                offset = 0
-                while True:
-                    relationships_query = """
-                    MATCH (n:NODE {repoId: $old_repo_id})-[r]->(m:NODE)
-                    RETURN n.node_id AS start_node_id, type(r) AS relationship_type, m.node_id AS end_node_id
-                    SKIP $offset LIMIT $limit
-                    """
-                    relationships_result = session.run(
-                        relationships_query,
-                        old_repo_id=old_repo_id,
-                        offset=offset,
-                        limit=relationship_batch_size,
-                    )
-                    relationships = [dict(record) for record in relationships_result]
-
-                    if not relationships:
-                        break
-
-                    relationship_query = """
-                    UNWIND $batch AS relationship
-                    MATCH (a:NODE {repoId: $new_repo_id, node_id: relationship.start_node_id}),
-                          (b:NODE {repoId: $new_repo_id, node_id: relationship.end_node_id})
-                    CALL apoc.create.relationship(a, relationship.relationship_type, {}, b) YIELD rel
-                    RETURN rel
-                    """
-                    session.run(
-                        relationship_query, new_repo_id=new_repo_id, batch=relationships
-                    )
-                    offset += relationship_batch_size
-
+            # Copied inside Neo4j, the driver call blocks so it runs off the loop
+            await asyncio.to_thread(
+                GraphDuplicator(self.inference_service.driver).duplicate,
+                old_repo_id,
+                new_repo_id,
+            )
             logger.info(
                 f"Successfully duplicated graph from {old_repo_id} to {new_repo_id}"
             )
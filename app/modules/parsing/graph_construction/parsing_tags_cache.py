@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tree_sitter_languages import get_language, get_parser
+
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of cached tags or the tag extraction logic changes
+TAGS_CACHE_VERSION = 2
+# Size the cache directory is trimmed back to, least recently used entries first
+TAGS_CACHE_MAX_BYTES = int(os.getenv("TAGS_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Entries written by a process between two checks of the directory size
+TAGS_CACHE_EVICT_EVERY = int(os.getenv("TAGS_CACHE_EVICT_EVERY", 1000))
+
+# Per-process caches, compiling a query or building a parser is paid once per language
+_languages: Dict[str, object] = {}
+_parsers: Dict[str, object] = {}
+_queries: Dict[str, Tuple[object, str]] = {}
+
+
+def get_scm_fname(lang):
+    # Load the tags queries
+    try:
+        return Path(os.path.dirname(__file__)).joinpath(
+            "queries", f"tree-sitter-{lang}-tags.scm"
+        )
+    except KeyError:
+        return
+
+
+def get_cached_language(lang: str):
+    if lang not in _languages:
+        _languages[lang] = get_language(lang)
+    return _languages[lang]
+
+
+def get_cached_parser(lang: str):
+    if lang not in _parsers:
+        _parsers[lang] = get_parser(lang)
+    return _parsers[lang]
+
+
+def get_cached_query(lang: str) -> Tuple[Optional[object], Optional[str]]:
+    """
+    Return the compiled tags query for a language and a version string that
+    changes whenever the query file or the cache format changes.
+    """
+    if lang not in _queries:
+        query_scm = get_scm_fname(lang)
+        if not query_scm or not query_scm.exists():
+            _queries[lang] = (None, None)
+        else:
+            query_text = query_scm.read_text()
+            query = get_cached_language(lang).query(query_text)
+            query_hash = hashlib.sha256(query_text.encode("utf-8")).hexdigest()[:16]
+            _queries[lang] = (query, f"v{TAGS_CACHE_VERSION}-{query_hash}")
+    return _queries[lang]
+
+
+class TagsCache:
+    """
+    On-disk tags cache keyed by (language, file content hash, query version).
+
+    Entries hold tags without file names, so the same content parsed from a
+    fork or another branch of a repository reuses them. Each entry is its own
+    JSON file written atomically, which keeps the cache safe to share between
+    worker processes. Hits refresh the modification time of an entry, and
+    every TAGS_CACHE_EVICT_EVERY writes the oldest entries are removed until
+    the directory fits in TAGS_CACHE_MAX_BYTES.
+    """
+
+    # Writes of this process since the directory size was last checked
+    _writes = 0
+    _writes_lock = threading.Lock()
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.getenv(
+            "TAGS_CACHE_DIR",
+            os.path.join(os.getenv("PROJECT_PATH", "projects"), ".tags_cache"),
+        )
+        self.enabled = True
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Tags cache disabled, cannot create {self.cache_dir}: {e}")
+            self.enabled = False
+
+    @staticmethod
+    def make_key(lang: str, code: str, query_version: str) -> str:
+        content_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        return f"{lang}-{query_version}-{content_hash}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[-2:], key + ".json")
+
+    def get(self, key: str) -> Optional[List[list]]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tags = json.load(f)
+            os.utime(path)
+            return tags
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable tags cache entry {key}: {e}")
+            return None
+
+    def set(self, key: str, tags: List[tuple]):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(tags, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write tags cache entry {key}: {e}")
+            return
+
+        with TagsCache._writes_lock:
+            TagsCache._writes += 1
+            if TagsCache._writes < TAGS_CACHE_EVICT_EVERY:
+                return
+            TagsCache._writes = 0
+        self.evict()
+
+    def evict(self, max_bytes: int = TAGS_CACHE_MAX_BYTES):
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        try:
+            for bucket in os.scandir(self.cache_dir):
+                if not bucket.is_dir():
+                    continue
+                for entry in os.scandir(bucket.path):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError as e:
+            logger.warning(f"Failed to scan tags cache {self.cache_dir}: {e}")
+            return
+        if total <= max_bytes:
+            return
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to evict tags cache entry {path}: {e}")
+                continue
+            total -= size
+            removed += 1
+        logger.info(f"Evicted {removed} tags cache entries from {self.cache_dir}")
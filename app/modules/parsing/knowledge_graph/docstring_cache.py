@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+from app.modules.utils.cache_tiers import (
+    DiskTier,
+    RedisTier,
+    decode_entry,
+    encode_entry,
+)
+
+logger = logging.getLogger(__name__)
+
+# "enabled" or "disabled"
+DOCSTRING_CACHE = os.getenv("DOCSTRING_CACHE", "enabled")
+DOCSTRING_CACHE_TTL = int(os.getenv("DOCSTRING_CACHE_TTL", 30 * 24 * 3600))
+# Size the disk tier is trimmed back to, least recently used entries first
+DOCSTRING_CACHE_DISK_MAX_BYTES = int(
+    os.getenv("DOCSTRING_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)
+)
+
+
+class DocstringCache:
+    """
+    Inference results keyed by the hash of the text sent to the LLM.
+
+    A key combines the resolved node text, the prompt version and the inference
+    model, so a node whose text is unchanged gets its docstring and tags back
+    without an LLM call, on any branch or fork. The docstring embedding is kept
+    alongside with the embedding model that produced it. Entries live in Redis
+    and, when DOCSTRING_CACHE_DIR is set, on disk as well.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.enabled = DOCSTRING_CACHE == "enabled"
+        self.redis = RedisTier("Docstring", DOCSTRING_CACHE_TTL)
+        self.disk = DiskTier(
+            "Docstring",
+            cache_dir or os.getenv("DOCSTRING_CACHE_DIR"),
+            DOCSTRING_CACHE_DISK_MAX_BYTES,
+        )
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(text_hash: str, prompt_version: str, model: str) -> str:
+        return f"docstring:{model}:{prompt_version}:{text_hash}"
+
+    def get_many(
+        self, text_hashes: Iterable[str], prompt_version: str, model: str
+    ) -> Dict[str, Dict]:
+        """Return cached entries by text hash, misses are left out."""
+        if not self.enabled:
+            return {}
+        text_hashes = list(dict.fromkeys(text_hashes))
+        keys = [self.make_key(h, prompt_version, model) for h in text_hashes]
+        if not keys:
+            return {}
+
+        payloads = self.redis.get_many(keys)
+
+        entries = {}
+        restored = {}
+        for text_hash, key, payload in zip(text_hashes, keys, payloads):
+            if payload is None:
+                payload = self.disk.read(key)
+                if payload is not None:
+                    restored[key] = payload
+            if payload is None:
+                continue
+            entry = decode_entry(payload, "docstring")
+            if entry is not None:
+                entries[text_hash] = entry
+
+        if restored:
+            self.redis.set_many(restored)
+        return entries
+
+    def set_many(self, entries: Dict[str, Dict], prompt_version: str, model: str):
+        """
+        Store entries by text hash. An entry holds docstring, tags and optionally
+        embedding with embedding_model.
+        """
+        if not self.enabled or not entries:
+            return
+        payloads = {
+            self.make_key(text_hash, prompt_version, model): encode_entry(entry)
+            for text_hash, entry in entries.items()
+        }
+        self.redis.set_many(payloads)
+        for key, payload in payloads.items():
+            self.disk.write(key, payload)
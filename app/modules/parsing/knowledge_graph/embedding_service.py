@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import List, Optional, Tuple
+
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# "torch" or "onnx", the ONNX backend needs sentence-transformers[onnx] installed
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# ONNX weights inside the model repository, e.g. a quantized int8 export such as
+# onnx/model_qint8_avx512_vnni.onnx
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+EMBEDDING_QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", 2048))
+# How long the query batcher waits for concurrent queries to join a batch
+EMBEDDING_BATCH_WAIT_SECONDS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", 5)) / 1000
+
+
+class EmbeddingService:
+    """
+    Process-wide sentence embedding model.
+
+    The model is loaded once per process, on first use, so forked Celery
+    workers load their own copy after the fork. Bulk encoding goes straight to
+    the model. Query embeddings are served from an LRU cache, and misses from
+    concurrent threads are gathered by a background thread into one batched
+    forward pass.
+    """
+
+    _instance: Optional["EmbeddingService"] = None
+    _instance_pid: Optional[int] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self.model = self._load_model()
+        self._model_lock = threading.Lock()
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending: "Queue[Tuple[str, Future]]" = Queue()
+        self._batcher = threading.Thread(
+            target=self._run_query_batcher, name="embedding-batcher", daemon=True
+        )
+        self._batcher.start()
+
+    @classmethod
+    def get_instance(cls) -> "EmbeddingService":
+        if cls._instance is None or cls._instance_pid != os.getpid():
+            with cls._instance_lock:
+                if cls._instance is None or cls._instance_pid != os.getpid():
+                    cls._instance = cls()
+                    cls._instance_pid = os.getpid()
+        return cls._instance
+
+    @staticmethod
+    def _load_model() -> SentenceTransformer:
+        if EMBEDDING_BACKEND == "onnx":
+            model_kwargs = (
+                {"file_name": EMBEDDING_ONNX_FILE} if EMBEDDING_ONNX_FILE else None
+            )
+            try:
+                model = SentenceTransformer(
+                    EMBEDDING_MODEL_NAME,
+                    device="cpu",
+                    backend="onnx",
+                    model_kwargs=model_kwargs,
+                )
+                logger.info(
+                    f"Loaded embedding model {EMBEDDING_MODEL_NAME} with the ONNX backend"
+                )
+                return model
+            except Exception as e:
+                logger.warning(
+                    f"ONNX embedding backend unavailable, falling back to torch: {e}"
+                )
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+        logger.info(f"Loaded embedding model {EMBEDDING_MODEL_NAME}")
+        return model
+
+    def encode(
+        self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE
+    ) -> List[List[float]]:
+        """Encode texts in batches, returning one vector per text in input order."""
+        if not texts:
+            return []
+        with self._model_lock:
+            embeddings = self.model.encode(
+                texts, batch_size=batch_size, show_progress_bar=False
+            )
+        return embeddings.tolist()
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        results: List[Optional[List[float]]] = [None] * len(queries)
+        futures = []
+        with self._cache_lock:
+            for i, query in enumerate(queries):
+                embedding = self._query_cache.get(query)
+                if embedding is not None:
+                    self._query_cache.move_to_end(query)
+                    results[i] = embedding
+        for i, query in enumerate(queries):
+            if results[i] is None:
+                future = Future()
+                self._pending.put((query, future))
+                futures.append((i, future))
+        for i, future in futures:
+            results[i] = future.result()
+        return results
+
+    def _run_query_batcher(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + EMBEDDING_BATCH_WAIT_SECONDS
+            try:
+                while len(batch) < EMBEDDING_BATCH_SIZE:
+                    timeout = max(deadline - time.monotonic(), 0)
+                    batch.append(self._pending.get(timeout=timeout))
+            except Empty:
+                pass
+
+            queries = list(dict.fromkeys(query for query, _ in batch))
+            try:
+                embeddings = dict(zip(queries, self.encode(queries)))
+            except Exception as e:
+                logger.error(f"Failed to embed {len(queries)} queries: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._cache_lock:
+                for query, embedding in embeddings.items():
+                    self._query_cache[query] = embedding
+                    self._query_cache.move_to_end(query)
+                while len(self._query_cache) > EMBEDDING_QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+            for query, future in batch:
+                future.set_result(embeddings[query])
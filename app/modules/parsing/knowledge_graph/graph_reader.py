@@ -0,0 +1,24 @@
+import os
+from typing import Any, Dict, Iterator
+
+# Records pulled from the server per round-trip while a result is streamed
+GRAPH_FETCH_SIZE = int(os.getenv("GRAPH_FETCH_SIZE", 1000))
+
+
+class GraphReader:
+    """
+    Reads large results from Neo4j without SKIP/LIMIT paging.
+
+    A query runs once and its records are yielded as the driver pulls them in
+    chunks of fetch_size, so the first records are available immediately and
+    the query is never re-run for later pages.
+    """
+
+    def __init__(self, driver, fetch_size: int = GRAPH_FETCH_SIZE):
+        self.driver = driver
+        self.fetch_size = fetch_size
+
+    def stream(self, query: str, **params: Any) -> Iterator[Dict[str, Any]]:
+        with self.driver.session(fetch_size=self.fetch_size) as session:
+            for record in session.run(query, **params):
+                yield dict(record)
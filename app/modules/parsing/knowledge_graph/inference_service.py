@@ -1,19 +1,30 @@
 import asyncio
+import bisect
+import hashlib
 import logging
 import os
 import re
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
 
 import tiktoken
-from neo4j import GraphDatabase
-from sentence_transformers import SentenceTransformer
+from redis import Redis
 from sqlalchemy.orm import Session
 
 from app.core.config_provider import config_provider
+from app.core.neo4j_driver import get_neo4j_driver
+from app.modules.intelligence.provider.adaptive_limiter import AdaptiveLimiter
 from app.modules.intelligence.provider.provider_service import (
     ProviderService,
 )
+from app.modules.parsing.knowledge_graph.docstring_cache import DocstringCache
+from app.modules.parsing.knowledge_graph.embedding_service import (
+    EMBEDDING_MODEL_NAME,
+    EmbeddingService,
+)
+from app.modules.parsing.knowledge_graph.graph_reader import GraphReader
 from app.modules.parsing.knowledge_graph.inference_schema import (
+    DocstringNode,
     DocstringRequest,
     DocstringResponse,
 )
@@ -22,23 +33,149 @@ from app.modules.search.search_service import SearchService
 
 logger = logging.getLogger(__name__)
 
+# Docstrings are embedded and written to Neo4j in batches of up to this size
+DOCSTRING_WRITE_BATCH_SIZE = int(os.getenv("DOCSTRING_WRITE_BATCH_SIZE", 1024))
+# Budget of code snippet tokens per inference request, and a cap on the nodes
+# per request so the structured answer fits the model's output limit
+DOCSTRING_BATCH_MAX_TOKENS = int(os.getenv("DOCSTRING_BATCH_MAX_TOKENS", 16000))
+DOCSTRING_BATCH_MAX_NODES = int(os.getenv("DOCSTRING_BATCH_MAX_NODES", 100))
+
+DOCSTRING_SYSTEM_PROMPT = "You are an expert software documentation assistant. You will analyze code and provide structured documentation in JSON format."
+
+DOCSTRING_PROMPT = """
+        You are a senior software engineer with expertise in code analysis and documentation. Your task is to generate concise docstrings for each code snippet and tagging it based on its purpose. Approach this task methodically, following these steps:
+
+        1. **Node Identification**:
+        - Carefully parse the provided `code_snippets` to identify each `node_id` and its corresponding code block.
+        - Ensure that every `node_id` present in the `code_snippets` is accounted for and processed individually.
+
+        2. **For Each Node**:
+        Perform the following tasks for every identified `node_id` and its associated code:
+
+        You are a software engineer tasked with generating concise docstrings for each code snippet and tagging it based on its purpose.
+
+        **Instructions**:
+        2.1. **Identify Code Type**:
+        - Determine whether each code snippet is primarily **backend** or **frontend**.
+        - Use common indicators:
+            - **Backend**: Handles database interactions, API endpoints, configuration, or server-side logic.
+            - **Frontend**: Contains UI components, event handling, state management, or styling.
+
+        2.2. **Summarize the Purpose**:
+        - Based on the identified type, write a brief (1-2 sentences) summary of the code's main purpose and functionality.
+        - Focus on what the code does, its role in the system, and any critical operations it performs.
+        - If the code snippet is related to **specific roles** like authentication, database access, or UI component, state management, explicitly mention this role.
+
+        2.3. **Assign Tags Based on Code Type**:
+        - Use these specific tags based on whether the code is identified as backend or frontend:
+
+        **Backend Tags**:
+            - **AUTH**: Handles authentication or authorization.
+            - **DATABASE**: Interacts with databases.
+            - **API**: Defines API endpoints.
+            - **UTILITY**: Provides helper or utility functions.
+            - **PRODUCER**: Sends messages to a queue or topic.
+            - **CONSUMER**: Processes messages from a queue or topic.
+            - **EXTERNAL_SERVICE**: Integrates with external services.
+            - **CONFIGURATION**: Manages configuration settings.
+
+        **Frontend Tags**:
+            - **UI_COMPONENT**: Renders a visual component in the UI.
+            - **FORM_HANDLING**: Manages form data submission and validation.
+            - **STATE_MANAGEMENT**: Manages application or component state.
+            - **DATA_BINDING**: Binds data to UI elements.
+            - **ROUTING**: Manages frontend navigation.
+            - **EVENT_HANDLING**: Handles user interactions.
+            - **STYLING**: Applies styling or theming.
+            - **MEDIA**: Manages media, like images or video.
+            - **ANIMATION**: Defines animations in the UI.
+            - **ACCESSIBILITY**: Implements accessibility features.
+            - **DATA_FETCHING**: Fetches data for frontend use.
+
+        Your response must be a valid JSON object containing a list of docstrings, where each docstring object has:
+        - node_id: The ID of the node being documented
+        - docstring: A concise description of the code's purpose and functionality
+        - tags: A list of relevant tags from the categories above
+
+        Here are the code snippets:
+
+        {code_snippets}
+        """
+
+# Part of every docstring cache key, changing either prompt invalidates the cache
+DOCSTRING_PROMPT_VERSION = hashlib.sha256(
+    (DOCSTRING_SYSTEM_PROMPT + DOCSTRING_PROMPT).encode("utf-8")
+).hexdigest()[:16]
+
+# Nodes whose batches failed are kept this long and retried by the next run
+INFERENCE_DEAD_LETTER_TTL = int(os.getenv("INFERENCE_DEAD_LETTER_TTL", 7 * 24 * 3600))
+
+REFERENCE_MARKER = "Code replaced for brevity"
+REFERENCE_PATTERN = re.compile(r"Code replaced for brevity\. See node_id ([a-f0-9]+)")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.warning("Warning: model not found. Using cl100k_base encoding.")
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def format_code_snippet(request: DocstringRequest) -> str:
+    return f"node_id: {request.node_id} \n```\n{request.text}\n```\n\n "
+
 
 class InferenceService:
+    _redis: Optional[Redis] = None
+
     def __init__(self, db: Session, user_id: Optional[str] = "dummy"):
-        neo4j_config = config_provider.get_neo4j_config()
-        self.driver = GraphDatabase.driver(
-            neo4j_config["uri"],
-            auth=(neo4j_config["username"], neo4j_config["password"]),
-        )
+        self.driver = get_neo4j_driver()
+        self.graph_reader = GraphReader(self.driver)
 
         self.provider_service = ProviderService(db, user_id)
-        self.embedding_model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+        self.embedding_service = EmbeddingService.get_instance()
+        self.docstring_cache = DocstringCache()
         self.search_service = SearchService(db)
         self.project_manager = ProjectService(db)
         self.parallel_requests = int(os.getenv("PARALLEL_REQUESTS", 50))
 
     def close(self):
-        self.driver.close()
+        # The Neo4j driver is shared by the process and closed on shutdown
+        pass
+
+    @classmethod
+    def _get_redis(cls) -> Redis:
+        if cls._redis is None:
+            cls._redis = Redis.from_url(config_provider.get_redis_url())
+        return cls._redis
+
+    @staticmethod
+    def _dead_letter_key(repo_id: str) -> str:
+        return f"inference:dead_letters:{repo_id}"
+
+    def load_dead_letters(self, repo_id: str) -> Set[str]:
+        """Node ids left without a docstring by earlier runs on the project."""
+        try:
+            node_ids = self._get_redis().smembers(self._dead_letter_key(repo_id))
+        except Exception as e:
+            logger.warning(f"Project {repo_id}: Failed to load dead letters: {e}")
+            return set()
+        return {node_id.decode("utf-8") for node_id in node_ids}
+
+    def store_dead_letters(self, repo_id: str, node_ids: List[str]):
+        """Replace the project's dead letters with the nodes that failed this run."""
+        key = self._dead_letter_key(repo_id)
+        try:
+            pipeline = self._get_redis().pipeline()
+            pipeline.delete(key)
+            if node_ids:
+                pipeline.sadd(key, *node_ids)
+                pipeline.expire(key, INFERENCE_DEAD_LETTER_TTL)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Project {repo_id}: Failed to store dead letters: {e}")
 
     def log_graph_stats(self, repo_id):
         query = """
@@ -74,95 +211,54 @@ class InferenceService:
 
     def num_tokens_from_string(self, string: str, model: str = "gpt-4") -> int:
         """Returns the number of tokens in a text string."""
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            logger.warning("Warning: model not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(string, disallowed_special=set()))
+        return len(get_encoding(model).encode(string, disallowed_special=set()))
 
     def fetch_graph(self, repo_id: str) -> List[Dict]:
-        batch_size = 500
-        all_nodes = []
-        with self.driver.session() as session:
-            offset = 0
-            while True:
-                result = session.run(
-                    "MATCH (n:NODE {repoId: $repo_id}) "
-                    "RETURN n.node_id AS node_id, n.text AS text, n.file_path AS file_path, n.start_line AS start_line, n.end_line AS end_line, n.name AS name "
-                    "SKIP $offset LIMIT $limit",
-                    repo_id=repo_id,
-                    offset=offset,
-                    limit=batch_size,
-                )
-                batch = [dict(record) for record in result]
-                if not batch:
-                    break
-                all_nodes.extend(batch)
-                offset += batch_size
+        all_nodes = list(
+            self.graph_reader.stream(
+                "MATCH (n:NODE {repoId: $repo_id}) "
+                "RETURN n.node_id AS node_id, n.text AS text, n.file_path AS file_path, n.start_line AS start_line, n.end_line AS end_line, n.name AS name",
+                repo_id=repo_id,
+            )
+        )
         logger.info(f"DEBUGNEO4J: Fetched {len(all_nodes)} nodes for repo {repo_id}")
         return all_nodes
 
     def get_entry_points(self, repo_id: str) -> List[str]:
-        batch_size = 400  # Define the batch size
-        all_entry_points = []
-        with self.driver.session() as session:
-            offset = 0
-            while True:
-                result = session.run(
-                    f"""
-                    MATCH (f:FUNCTION)
-                    WHERE f.repoId = '{repo_id}'
-                    AND NOT ()-[:CALLS]->(f)
-                    AND (f)-[:CALLS]->()
-                    RETURN f.node_id as node_id
-                    SKIP $offset LIMIT $limit
-                    """,
-                    offset=offset,
-                    limit=batch_size,
-                )
-                batch = result.data()
-                if not batch:
-                    break
-                all_entry_points.extend([record["node_id"] for record in batch])
-                offset += batch_size
-        return all_entry_points
+        return [
+            record["node_id"]
+            for record in self.graph_reader.stream(
+                """
+                MATCH (f:FUNCTION)
+                WHERE f.repoId = $repo_id
+                AND NOT ()-[:CALLS]->(f)
+                AND (f)-[:CALLS]->()
+                RETURN f.node_id as node_id
+                """,
+                repo_id=repo_id,
+            )
+        ]
 
     def get_neighbours(self, node_id: str, repo_id: str):
-        with self.driver.session() as session:
-            batch_size = 400  # Define the batch size
-            all_nodes_info = []
-            offset = 0
-            while True:
-                result = session.run(
-                    """
-                    MATCH (start {node_id: $node_id, repoId: $repo_id})
-                    OPTIONAL MATCH (start)-[:CALLS]->(direct_neighbour)
-                    OPTIONAL MATCH (start)-[:CALLS]->()-[:CALLS*0..]->(indirect_neighbour)
-                    WITH start, COLLECT(DISTINCT direct_neighbour) + COLLECT(DISTINCT indirect_neighbour) AS all_neighbours
-                    UNWIND all_neighbours AS neighbour
-                    WITH start, neighbour
-                    WHERE neighbour IS NOT NULL AND neighbour <> start
-                    RETURN DISTINCT neighbour.node_id AS node_id, neighbour.name AS function_name, labels(neighbour) AS labels
-                    SKIP $offset LIMIT $limit
-                    """,
-                    node_id=node_id,
-                    repo_id=repo_id,
-                    offset=offset,
-                    limit=batch_size,
-                )
-                batch = result.data()
-                if not batch:
-                    break
-                all_nodes_info.extend(
-                    [
-                        record["node_id"]
-                        for record in batch
-                        if "FUNCTION" in record["labels"]
-                    ]
-                )
-                offset += batch_size
-            return all_nodes_info
+        # The traversal runs once, its result is streamed instead of re-run per page
+        return [
+            record["node_id"]
+            for record in self.graph_reader.stream(
+                """
+                MATCH (start {node_id: $node_id, repoId: $repo_id})
+                OPTIONAL MATCH (start)-[:CALLS]->(direct_neighbour)
+                OPTIONAL MATCH (start)-[:CALLS]->()-[:CALLS*0..]->(indirect_neighbour)
+                WITH start, COLLECT(DISTINCT direct_neighbour) + COLLECT(DISTINCT indirect_neighbour) AS all_neighbours
+                UNWIND all_neighbours AS neighbour
+                WITH start, neighbour
+                WHERE neighbour IS NOT NULL AND neighbour <> start
+                RETURN DISTINCT neighbour.node_id AS node_id, neighbour.name AS function_name, labels(neighbour) AS labels
+                """,
+                node_id=node_id,
+                repo_id=repo_id,
+            )
+            if "FUNCTION" in record["labels"]
+        ]
 
     def get_entry_points_for_nodes(
         self, node_ids: List[str], repo_id: str
@@ -190,66 +286,100 @@ class InferenceService:
                 for record in result
             }
 
-    def batch_nodes(
-        self, nodes: List[Dict], max_tokens: int = 16000, model: str = "gpt-4"
-    ) -> List[List[DocstringRequest]]:
-        batches = []
-        current_batch = []
-        current_tokens = 0
-        node_dict = {node["node_id"]: node for node in nodes}
-
-        def replace_referenced_text(
-            text: str, node_dict: Dict[str, Dict[str, str]]
-        ) -> str:
-            pattern = r"Code replaced for brevity\. See node_id ([a-f0-9]+)"
-            regex = re.compile(pattern)
-
-            def replace_match(match):
-                node_id = match.group(1)
-                if node_id in node_dict:
-                    return "\n" + node_dict[node_id]["text"].split("\n", 1)[-1]
+    def resolve_node_texts(
+        self, nodes: List[Dict], node_dict: Optional[Dict[str, Dict]] = None
+    ) -> List[DocstringRequest]:
+        """Expand "Code replaced for brevity" references into the text sent to the LLM."""
+        if node_dict is None:
+            node_dict = {node["node_id"]: node for node in nodes}
+
+        # Expanded body of every referenced node, each node is expanded once
+        # however many nodes reference it
+        bodies: Dict[str, str] = {}
+        expanding = set()
+
+        def expand(text: str) -> str:
+            if REFERENCE_MARKER not in text:
+                return text
+            return REFERENCE_PATTERN.sub(replace_match, text)
+
+        def replace_match(match):
+            node_id = match.group(1)
+            if node_id not in node_dict or node_id in expanding:
                 return match.group(0)
-
-            previous_text = None
-            current_text = text
-
-            while previous_text != current_text:
-                previous_text = current_text
-                current_text = regex.sub(replace_match, current_text)
-            return current_text
-
+            if node_id not in bodies:
+                expanding.add(node_id)
+                body = (node_dict[node_id].get("text") or "").split("\n", 1)[-1]
+                bodies[node_id] = expand(body)
+                expanding.discard(node_id)
+            return "\n" + bodies[node_id]
+
+        requests = []
         for node in nodes:
             if not node.get("text"):
                 logger.warning(f"Node {node['node_id']} has no text. Skipping...")
                 continue
 
-            updated_text = replace_referenced_text(node["text"], node_dict)
-            node_tokens = self.num_tokens_from_string(updated_text, model)
+            requests.append(
+                DocstringRequest(node_id=node["node_id"], text=expand(node["text"]))
+            )
+        return requests
 
+    def batch_nodes(
+        self,
+        requests: List[DocstringRequest],
+        max_tokens: int = DOCSTRING_BATCH_MAX_TOKENS,
+        model: str = "gpt-4",
+    ) -> List[List[DocstringRequest]]:
+        """
+        Pack requests into as few batches as possible, largest first.
+
+        Each request is counted once, as the snippet it becomes in the prompt,
+        and placed in the open batch with the least room that still fits it
+        (best-fit decreasing). A batch holds at most max_tokens of snippets and
+        DOCSTRING_BATCH_MAX_NODES nodes, which bounds the size of the answer.
+        """
+        sized = []
+        for request in requests:
+            node_tokens = self.num_tokens_from_string(
+                format_code_snippet(request), model
+            )
             if node_tokens > max_tokens:
                 logger.warning(
-                    f"Node {node['node_id']} - {node_tokens} tokens, has exceeded the max_tokens limit. Skipping..."
+                    f"Node {request.node_id} - {node_tokens} tokens, has exceeded the max_tokens limit. Skipping..."
                 )
                 continue
-
-            if current_tokens + node_tokens > max_tokens:
-                if current_batch:  # Only append if there are items
-                    batches.append(current_batch)
-                current_batch = []
-                current_tokens = 0
-
-            current_batch.append(
-                DocstringRequest(node_id=node["node_id"], text=updated_text)
+            sized.append((node_tokens, request))
+        sized.sort(key=lambda item: item[0], reverse=True)
+
+        batches: List[List[DocstringRequest]] = []
+        batch_tokens: List[int] = []
+        # (remaining tokens, batch index) of batches that can take more nodes,
+        # sorted so the tightest fit is found by bisection
+        open_batches: List[Tuple[int, int]] = []
+        for node_tokens, request in sized:
+            position = bisect.bisect_left(open_batches, (node_tokens, -1))
+            if position < len(open_batches):
+                remaining, index = open_batches.pop(position)
+            else:
+                index = len(batches)
+                batches.append([])
+                batch_tokens.append(0)
+                remaining = max_tokens
+
+            batches[index].append(request)
+            batch_tokens[index] += node_tokens
+            if len(batches[index]) < DOCSTRING_BATCH_MAX_NODES:
+                bisect.insort(open_batches, (remaining - node_tokens, index))
+
+        if batches:
+            fill_ratios = [tokens / max_tokens for tokens in batch_tokens]
+            logger.info(
+                f"Batched {len(sized)} nodes into {len(batches)} batches, "
+                f"{sum(batch_tokens)} tokens, fill ratio "
+                f"avg {sum(fill_ratios) / len(fill_ratios):.2f} "
+                f"min {min(fill_ratios):.2f}"
             )
-            current_tokens += node_tokens
-
-        if current_batch:
-            batches.append(current_batch)
-
-        total_nodes = sum(len(batch) for batch in batches)
-        logger.info(f"Batched {total_nodes} nodes into {len(batches)} batches")
-        logger.info(f"Batch sizes: {[len(batch) for batch in batches]}")
-
         return batches
 
     async def generate_docstrings_for_entry_points(
@@ -402,7 +532,12 @@ class InferenceService:
             logger.error(f"Entry point response generation failed: {e}")
             return DocstringResponse(docstrings=[])
 
-    async def generate_docstrings(self, repo_id: str) -> Dict[str, DocstringResponse]:
+    async def generate_docstrings(
+        self,
+        repo_id: str,
+        node_ids: Optional[List[str]] = None,
+        node_texts: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, DocstringResponse]:
         logger.info(
             f"DEBUGNEO4J: Function: {self.generate_docstrings.__name__}, Repo ID: {repo_id}"
         )
@@ -412,12 +547,27 @@ class InferenceService:
             f"DEBUGNEO4J: After fetch graph, Repo ID: {repo_id}, Nodes: {len(nodes)}"
         )
         self.log_graph_stats(repo_id)
+
+        # Referenced text is resolved against the whole graph, but only the
+        # requested nodes are indexed and sent for inference
+        node_dict = {node["node_id"]: node for node in nodes}
+        # Text of referenced nodes that was dropped from the graph by a previous run
+        for node_id, text in (node_texts or {}).items():
+            if node_id in node_dict and not node_dict[node_id].get("text"):
+                node_dict[node_id]["text"] = text
+        if node_ids is not None:
+            # Nodes that failed in earlier runs are retried along with them
+            selected_ids = set(node_ids) | self.load_dead_letters(repo_id)
+            nodes = [node for node in nodes if node["node_id"] in selected_ids]
+            self.search_service.delete_node_indices(repo_id, list(selected_ids))
         logger.info(
             f"Creating search indices for project {repo_id} with nodes count {len(nodes)}"
         )
 
-        # Prepare a list of nodes for bulk insert
-        nodes_to_index = [
+        # The nodes are already in memory, they are needed to resolve references
+        # during inference. Only the index entries derived from them are built as
+        # COPY consumes them, one chunk at a time, instead of as a second list.
+        nodes_to_index = (
             {
                 "project_id": repo_id,
                 "node_id": node["node_id"],
@@ -428,13 +578,13 @@ class InferenceService:
             for node in nodes
             if node.get("file_path") not in {None, ""}
             and node.get("name") not in {None, ""}
-        ]
-
-        # Perform bulk insert
-        await self.search_service.bulk_create_search_indices(nodes_to_index)
+        )
+        indexed_count = await self.search_service.bulk_create_search_indices(
+            nodes_to_index
+        )
 
         logger.info(
-            f"Project {repo_id}: Created search indices over {len(nodes_to_index)} nodes"
+            f"Project {repo_id}: Created search indices over {indexed_count} nodes"
         )
 
         await self.search_service.commit_indices()
@@ -452,32 +602,122 @@ class InferenceService:
         #     f"DEBUGNEO4J: After get neighbours, Repo ID: {repo_id}, Entry points neighbors: {len(entry_points_neighbors)}"
         # )
         # self.log_graph_stats(repo_id)
-        batches = self.batch_nodes(nodes)
+        requests = self.resolve_node_texts(nodes, node_dict)
+        inference_model = self.provider_service.inference_config.model
+        text_hashes = {
+            request.node_id: DocstringCache.hash_text(request.text)
+            for request in requests
+        }
+        cached = await asyncio.to_thread(
+            self.docstring_cache.get_many,
+            text_hashes.values(),
+            DOCSTRING_PROMPT_VERSION,
+            inference_model,
+        )
+
+        # Cache hits skip batching, nodes sharing a text are sent once and the
+        # answer is copied to the rest
+        cached_docstrings = []
+        cached_embeddings = {}
+        nodes_by_text: Dict[str, List[str]] = {}
+        misses = []
+        for request in requests:
+            text_hash = text_hashes[request.node_id]
+            entry = cached.get(text_hash)
+            if entry is not None:
+                cached_docstrings.append(
+                    DocstringNode(
+                        node_id=request.node_id,
+                        docstring=entry["docstring"],
+                        tags=entry.get("tags") or [],
+                    )
+                )
+                if entry.get("embedding_model") == EMBEDDING_MODEL_NAME:
+                    cached_embeddings[request.node_id] = entry["embedding"]
+            elif text_hash in nodes_by_text:
+                nodes_by_text[text_hash].append(request.node_id)
+            else:
+                nodes_by_text[text_hash] = [request.node_id]
+                misses.append(request)
+        logger.info(
+            f"Project {repo_id}: {len(cached_docstrings)} docstrings served from cache, "
+            f"{len(misses)} nodes sent for inference"
+        )
+
+        batches = self.batch_nodes(misses)
         all_docstrings = {"docstrings": []}
 
-        semaphore = asyncio.Semaphore(self.parallel_requests)
+        project = self.project_manager.get_project_from_db_by_id_sync(repo_id)
+        is_local_repo = True if project and project.get("repo_path") else False
+        docstring_queue = asyncio.Queue()
+        writer = asyncio.create_task(
+            self.write_docstrings(
+                repo_id,
+                docstring_queue,
+                is_local_repo,
+                text_hashes=text_hashes,
+                inference_model=inference_model,
+            )
+        )
+        if cached_docstrings:
+            await docstring_queue.put(
+                (DocstringResponse(docstrings=cached_docstrings), cached_embeddings)
+            )
+
+        # Concurrency is governed by the provider's AdaptiveLimiter, batches
+        # that still fail after its retries are dead-lettered
+        dead_letters: List[List[DocstringRequest]] = []
 
         async def process_batch(batch, batch_index: int):
-            async with semaphore:
-                logger.info(f"Processing batch {batch_index} for project {repo_id}")
-                response = await self.generate_response(batch, repo_id)
-                if not isinstance(response, DocstringResponse):
-                    logger.warning(
-                        f"Parsing project {repo_id}: Invalid response from LLM. Not an instance of DocstringResponse. Retrying..."
-                    )
-                    response = await self.generate_response(batch, repo_id)
-                else:
-                    self.update_neo4j_with_docstrings(repo_id, response)
+            logger.info(f"Processing batch {batch_index} for project {repo_id}")
+            response = await self.generate_response(batch, repo_id)
+            if not response.docstrings:
+                dead_letters.append(batch)
                 return response
+            for docstring in list(response.docstrings):
+                text_hash = text_hashes.get(docstring.node_id)
+                for node_id in nodes_by_text.get(text_hash, [])[1:]:
+                    response.docstrings.append(
+                        docstring.model_copy(update={"node_id": node_id})
+                    )
+            await docstring_queue.put((response, {}))
+            return response
 
         tasks = [process_batch(batch, i) for i, batch in enumerate(batches)]
-        results = await asyncio.gather(*tasks)
-
-        for result in results:
-            if not isinstance(result, DocstringResponse):
-                logger.error(
-                    f"Project {repo_id}: Invalid response from during inference. Manually verify the project completion."
+        try:
+            await asyncio.gather(*tasks)
+            if dead_letters:
+                # Retried once the rest is done, when the provider is less loaded
+                failed_batches = dead_letters[:]
+                dead_letters.clear()
+                logger.info(
+                    f"Project {repo_id}: Retrying {len(failed_batches)} failed batches"
+                )
+                await asyncio.gather(
+                    *[
+                        process_batch(batch, i)
+                        for i, batch in enumerate(failed_batches, len(batches))
+                    ]
                 )
+        finally:
+            await docstring_queue.put(None)
+            await writer
+
+        failed_node_ids = [
+            node_id
+            for batch in dead_letters
+            for request in batch
+            for node_id in nodes_by_text.get(
+                text_hashes[request.node_id], [request.node_id]
+            )
+        ]
+        if failed_node_ids:
+            logger.error(
+                f"Project {repo_id}: {len(dead_letters)} batches failed during inference, "
+                f"{len(failed_node_ids)} nodes have no docstring and are retried "
+                f"by the next run: {failed_node_ids}"
+            )
+        await asyncio.to_thread(self.store_dead_letters, repo_id, failed_node_ids)
 
         # updated_docstrings = await self.generate_docstrings_for_entry_points(
         #     all_docstrings, entry_points_neighbors
@@ -488,81 +728,17 @@ class InferenceService:
     async def generate_response(
         self, batch: List[DocstringRequest], repo_id: str
     ) -> DocstringResponse:
-        base_prompt = """
-        You are a senior software engineer with expertise in code analysis and documentation. Your task is to generate concise docstrings for each code snippet and tagging it based on its purpose. Approach this task methodically, following these steps:
-
-        1. **Node Identification**:
-        - Carefully parse the provided `code_snippets` to identify each `node_id` and its corresponding code block.
-        - Ensure that every `node_id` present in the `code_snippets` is accounted for and processed individually.
-
-        2. **For Each Node**:
-        Perform the following tasks for every identified `node_id` and its associated code:
-
-        You are a software engineer tasked with generating concise docstrings for each code snippet and tagging it based on its purpose.
-
-        **Instructions**:
-        2.1. **Identify Code Type**:
-        - Determine whether each code snippet is primarily **backend** or **frontend**.
-        - Use common indicators:
-            - **Backend**: Handles database interactions, API endpoints, configuration, or server-side logic.
-            - **Frontend**: Contains UI components, event handling, state management, or styling.
-
-        2.2. **Summarize the Purpose**:
-        - Based on the identified type, write a brief (1-2 sentences) summary of the code's main purpose and functionality.
-        - Focus on what the code does, its role in the system, and any critical operations it performs.
-        - If the code snippet is related to **specific roles** like authentication, database access, or UI component, state management, explicitly mention this role.
-
-        2.3. **Assign Tags Based on Code Type**:
-        - Use these specific tags based on whether the code is identified as backend or frontend:
-
-        **Backend Tags**:
-            - **AUTH**: Handles authentication or authorization.
-            - **DATABASE**: Interacts with databases.
-            - **API**: Defines API endpoints.
-            - **UTILITY**: Provides helper or utility functions.
-            - **PRODUCER**: Sends messages to a queue or topic.
-            - **CONSUMER**: Processes messages from a queue or topic.
-            - **EXTERNAL_SERVICE**: Integrates with external services.
-            - **CONFIGURATION**: Manages configuration settings.
-
-        **Frontend Tags**:
-            - **UI_COMPONENT**: Renders a visual component in the UI.
-            - **FORM_HANDLING**: Manages form data submission and validation.
-            - **STATE_MANAGEMENT**: Manages application or component state.
-            - **DATA_BINDING**: Binds data to UI elements.
-            - **ROUTING**: Manages frontend navigation.
-            - **EVENT_HANDLING**: Handles user interactions.
-            - **STYLING**: Applies styling or theming.
-            - **MEDIA**: Manages media, like images or video.
-            - **ANIMATION**: Defines animations in the UI.
-            - **ACCESSIBILITY**: Implements accessibility features.
-            - **DATA_FETCHING**: Fetches data for frontend use.
-
-        Your response must be a valid JSON object containing a list of docstrings, where each docstring object has:
-        - node_id: The ID of the node being documented
-        - docstring: A concise description of the code's purpose and functionality
-        - tags: A list of relevant tags from the categories above
-
-        Here are the code snippets:
-
-        {code_snippets}
-        """
-
         # Prepare the code snippets
-        code_snippets = ""
-        for request in batch:
-            code_snippets += (
-                f"node_id: {request.node_id} \n```\n{request.text}\n```\n\n "
-            )
+        code_snippets = "".join(format_code_snippet(request) for request in batch)
 
         messages = [
             {
                 "role": "system",
-                "content": "You are an expert software documentation assistant. You will analyze code and provide structured documentation in JSON format.",
+                "content": DOCSTRING_SYSTEM_PROMPT,
             },
             {
                 "role": "user",
-                "content": base_prompt.format(code_snippets=code_snippets),
+                "content": DOCSTRING_PROMPT.format(code_snippets=code_snippets),
             },
         ]
 
@@ -571,11 +747,17 @@ class InferenceService:
         start_time = time.time()
         logger.info(f"Parsing project {repo_id}: Starting the inference process...")
 
+        limiter = AdaptiveLimiter.for_provider(
+            self.provider_service.inference_config.provider
+        )
         try:
-            result = await self.provider_service.call_llm_with_structured_output(
-                messages=messages,
-                output_schema=DocstringResponse,
-                config_type="inference",
+            result = await limiter.run(
+                lambda: self.provider_service.call_llm_with_structured_output(
+                    messages=messages,
+                    output_schema=DocstringResponse,
+                    config_type="inference",
+                ),
+                tokens=self.num_tokens_from_string(messages[1]["content"]),
             )
         except Exception as e:
             logger.error(
@@ -590,26 +772,51 @@ class InferenceService:
         return result
 
     def generate_embedding(self, text: str) -> List[float]:
-        embedding = self.embedding_model.encode(text)
-        return embedding.tolist()
+        return self.embedding_service.encode([text])[0]
 
-    def update_neo4j_with_docstrings(self, repo_id: str, docstrings: DocstringResponse):
-        with self.driver.session() as session:
-            batch_size = 300
-            docstring_list = [
-                {
-                    "node_id": n.node_id,
-                    "docstring": n.docstring,
-                    "tags": n.tags,
-                    "embedding": self.generate_embedding(n.docstring),
-                }
-                for n in docstrings.docstrings
-            ]
+    def update_neo4j_with_docstrings(
+        self,
+        repo_id: str,
+        docstrings: DocstringResponse,
+        is_local_repo: Optional[bool] = None,
+        embeddings: Optional[Dict[str, List[float]]] = None,
+    ) -> Dict[str, List[float]]:
+        """
+        Store docstrings, tags and embeddings on their nodes, returning the
+        embedding written per node_id. Embeddings already known, e.g. from the
+        docstring cache, are not encoded again.
+        """
+        if is_local_repo is None:
             project = self.project_manager.get_project_from_db_by_id_sync(repo_id)
-            repo_path = project.get("repo_path")
-            is_local_repo = True if repo_path else False
-            for i in range(0, len(docstring_list), batch_size):
-                batch = docstring_list[i : i + batch_size]
+            is_local_repo = True if project.get("repo_path") else False
+        embeddings = embeddings or {}
+
+        # Sorted by length so each encode batch pads to similar sizes, every
+        # batch is written as soon as its vectors are ready
+        items = sorted(docstrings.docstrings, key=lambda n: len(n.docstring))
+        batch_size = 300
+        written = {}
+        with self.driver.session() as session:
+            for i in range(0, len(items), batch_size):
+                chunk = items[i : i + batch_size]
+                to_encode = [n for n in chunk if n.node_id not in embeddings]
+                encoded = self.embedding_service.encode(
+                    [n.docstring for n in to_encode]
+                )
+                for n, embedding in zip(to_encode, encoded):
+                    written[n.node_id] = embedding
+                for n in chunk:
+                    if n.node_id in embeddings:
+                        written[n.node_id] = embeddings[n.node_id]
+                batch = [
+                    {
+                        "node_id": n.node_id,
+                        "docstring": n.docstring,
+                        "tags": n.tags,
+                        "embedding": written[n.node_id],
+                    }
+                    for n in chunk
+                ]
                 session.run(
                     """
                     UNWIND $batch AS item
@@ -622,6 +829,72 @@ class InferenceService:
                     batch=batch,
                     repo_id=repo_id,
                 )
+        return written
+
+    async def write_docstrings(
+        self,
+        repo_id: str,
+        queue: asyncio.Queue,
+        is_local_repo: bool,
+        text_hashes: Optional[Dict[str, str]] = None,
+        inference_model: Optional[str] = None,
+    ):
+        """
+        Embed and store (docstrings, embeddings) pairs put on the queue until
+        None is received.
+
+        Responses that arrive while a batch is being encoded are merged into the
+        next batch, so the model sees large batches without holding results back.
+        Docstrings of nodes in text_hashes that were not cache hits are added to
+        the docstring cache once written.
+        """
+        done = False
+        while not done:
+            docstrings = []
+            embeddings = {}
+            item = await queue.get()
+            while True:
+                if item is None:
+                    done = True
+                    break
+                docstrings.extend(item[0].docstrings)
+                embeddings.update(item[1])
+                if len(docstrings) >= DOCSTRING_WRITE_BATCH_SIZE or queue.empty():
+                    break
+                item = queue.get_nowait()
+
+            if docstrings:
+                try:
+                    written = await asyncio.to_thread(
+                        self.update_neo4j_with_docstrings,
+                        repo_id,
+                        DocstringResponse(docstrings=docstrings),
+                        is_local_repo,
+                        embeddings,
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Parsing project {repo_id}: Failed to store {len(docstrings)} docstrings: {e}"
+                    )
+                    continue
+
+                if text_hashes and inference_model:
+                    entries = {
+                        text_hashes[n.node_id]: {
+                            "docstring": n.docstring,
+                            "tags": n.tags,
+                            "embedding": written[n.node_id],
+                            "embedding_model": EMBEDDING_MODEL_NAME,
+                        }
+                        for n in docstrings
+                        if n.node_id in text_hashes and n.node_id not in embeddings
+                    }
+                    await asyncio.to_thread(
+                        self.docstring_cache.set_many,
+                        entries,
+                        DOCSTRING_PROMPT_VERSION,
+                        inference_model,
+                    )
 
     def create_vector_index(self):
         with self.driver.session() as session:
@@ -637,8 +910,13 @@ class InferenceService:
                 """
             )
 
-    async def run_inference(self, repo_id: str):
-        docstrings = await self.generate_docstrings(repo_id)
+    async def run_inference(
+        self,
+        repo_id: str,
+        node_ids: Optional[List[str]] = None,
+        node_texts: Optional[Dict[str, str]] = None,
+    ):
+        docstrings = await self.generate_docstrings(repo_id, node_ids, node_texts)
         logger.info(
             f"DEBUGNEO4J: After generate docstrings, Repo ID: {repo_id}, Docstrings: {len(docstrings)}"
         )
@@ -651,8 +929,10 @@ class InferenceService:
         query: str,
         node_ids: Optional[List[str]] = None,
         top_k: int = 5,
+        embedding: Optional[List[float]] = None,
     ) -> List[Dict]:
-        embedding = self.generate_embedding(query)
+        if embedding is None:
+            embedding = self.embedding_service.embed_query(query)
 
         with self.driver.session() as session:
             if node_ids:
@@ -1,9 +1,11 @@
 import logging
 from datetime import datetime
+from typing import Optional
 
 from fastapi import HTTPException
-from sqlalchemy import String, cast
+from sqlalchemy import String, cast, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.modules.projects.projects_model import Project
@@ -21,17 +23,23 @@ class ProjectNotFoundError(ProjectServiceError):
 
 
 class ProjectService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, async_db: Optional[AsyncSession] = None):
         self.db = db
+        # Serves the lookups on the conversation path without blocking the loop
+        self.async_db = async_db
 
     async def get_project_name(self, project_ids: list) -> str:
         try:
-            projects = self.db.query(Project).filter(Project.id.in_(project_ids)).all()
-            if not projects:
+            query = select(Project.repo_name).where(Project.id.in_(project_ids))
+            if self.async_db is not None:
+                project = (await self.async_db.execute(query)).first()
+            else:
+                project = self.db.execute(query).first()
+            if project is None:
                 raise ProjectNotFoundError(
                     "No valid projects found for the provided project IDs."
                 )
-            project_name = projects[0].repo_name
+            project_name = project.repo_name
             logger.info(
                 f"Retrieved project name: {project_name} for project IDs: {project_ids}"
             )
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, FetchedValue, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 
 from app.core.base_model import Base
@@ -13,5 +14,25 @@ class SearchIndex(Base):
     name = Column(String, index=True)
     file_path = Column(String, index=True)
     content = Column(Text)
+    # Weighted lexemes of name, file_path and content, kept current by the
+    # search_indices_search_vector trigger
+    search_vector = Column(
+        TSVECTOR, server_default=FetchedValue(), server_onupdate=FetchedValue()
+    )
 
     project = relationship("Project", back_populates="search_indices")
+
+    __table_args__ = (
+        Index(
+            "idx_search_indices_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+        # Serves substring and similarity matches on identifiers
+        Index(
+            "idx_search_indices_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
@@ -1,11 +1,22 @@
+import io
 import os
-from typing import Dict, List
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
 
-from sqlalchemy import delete, or_
+from sqlalchemy import delete, func, insert, literal, or_, select
 from sqlalchemy.orm import Session
 
 from app.modules.search.search_models import SearchIndex
 
+# Text search configuration of search_indices.search_vector, without stemming
+SEARCH_TS_CONFIG = "simple"
+SEARCH_RESULT_LIMIT = 10
+# Query words, split the way the search vector splits names and paths
+SEARCH_WORD_PATTERN = re.compile(r"[^\W_]+")
+# Rows sent per COPY while index entries are streamed in
+SEARCH_INDEX_COPY_CHUNK_ROWS = int(os.getenv("SEARCH_INDEX_COPY_CHUNK_ROWS", 5000))
+SEARCH_INDEX_COPY_COLUMNS = ("project_id", "node_id", "name", "file_path", "content")
+
 
 class SearchService:
     def __init__(self, db: Session):
@@ -15,131 +26,181 @@ class SearchService:
     async def commit_indices(self):
         self.db.commit()
 
-    async def search_codebase(self, project_id: str, query: str) -> List[Dict]:
-        # Split the query into words
-        query_words = query.lower().split()
-
-        # Perform the search
-        results = (
-            self.db.query(SearchIndex)
-            .filter(
+    async def search_codebase(
+        self, project_id: str, query: str, limit: int = SEARCH_RESULT_LIMIT
+    ) -> List[Dict]:
+        """
+        Nodes of a project matching any word of the query, best first.
+
+        Words are matched as prefixes against the full-text index of name, file
+        path and content, and as substrings of the name through the trigram
+        index. Rows are ranked in Postgres, name matches weigh most and the
+        trigram similarity of the name to the whole query breaks ties, so only
+        the best row per node of the top limit nodes is loaded.
+        """
+        query_words = SEARCH_WORD_PATTERN.findall(query.lower())
+        if not query_words:
+            return []
+
+        ts_query = func.to_tsquery(
+            SEARCH_TS_CONFIG, " | ".join(f"{word}:*" for word in query_words)
+        )
+        relevance = func.ts_rank(SearchIndex.search_vector, ts_query) + func.similarity(
+            SearchIndex.name, " ".join(query_words)
+        )
+        # Best row of each node, then the best nodes
+        ranked = (
+            select(
+                SearchIndex.node_id,
+                SearchIndex.name,
+                SearchIndex.file_path,
+                SearchIndex.content,
+                relevance.label("relevance"),
+            )
+            .where(
                 SearchIndex.project_id == project_id,
                 or_(
-                    *[
-                        or_(
-                            SearchIndex.name.ilike(f"%{word}%"),
-                            SearchIndex.file_path.ilike(f"%{word}%"),
-                            SearchIndex.content.ilike(f"%{word}%"),
-                        )
-                        for word in query_words
-                    ]
+                    SearchIndex.search_vector.bool_op("@@")(ts_query),
+                    *[SearchIndex.name.ilike(f"%{word}%") for word in query_words],
                 ),
             )
-            .all()
+            .distinct(SearchIndex.node_id)
+            .order_by(SearchIndex.node_id, relevance.desc())
+            .subquery()
         )
+        results = self.db.execute(
+            select(ranked).order_by(ranked.c.relevance.desc()).limit(limit)
+        ).all()
 
-        # Format and sort the results
-        formatted_results = []
-        ids = []
-        for result in results:
-            relevance = self._calculate_relevance(result, query_words)
-            if result.node_id not in ids:
-                formatted_results.append(
-                    {
-                        "node_id": result.node_id,
-                        "name": result.name,
-                        "file_path": (
-                            result.file_path.split(self.project_path, 1)[-1].split(
-                                "/", 2
-                            )[
-                                -1
-                            ]  # ensure that your project path value does not end with a /
-                            if self.project_path in result.file_path
-                            else result.file_path
-                        ),
-                        "content": result.content,
-                        "match_type": self._determine_match_type(result, query_words),
-                        "relevance": relevance,
-                    }
-                )
-            ids.append(result.node_id)
-
-        # Sort results by relevance
-        formatted_results.sort(key=lambda x: x["relevance"], reverse=True)
-
-        return formatted_results[:10]
-
-    def _calculate_relevance(
-        self, result: SearchIndex, query_words: List[str]
-    ) -> float:
-        relevance = 0
-
-        for word in query_words:
-            if word in result.name.lower():
-                relevance += 3  # Highest relevance for name match
-            if word in result.file_path.lower():
-                relevance += 2  # Medium relevance for file path match
-            if word in result.content.lower():
-                relevance += 1  # Lowest relevance for content match
-
-        # Adjust relevance based on how many query words match
-        relevance *= len(
-            [word for word in query_words if word in result.content.lower()]
-        ) / len(query_words)
-
-        # Adjust relevance based on how close the match is to the full string
-        name_similarity = self._string_similarity(" ".join(query_words), result.name)
-        file_path_similarity = self._string_similarity(
-            " ".join(query_words), result.file_path
-        )
-
-        relevance += (name_similarity + file_path_similarity) / 2
-
-        return relevance
+        return [
+            {
+                "node_id": result.node_id,
+                "name": result.name,
+                "file_path": (
+                    result.file_path.split(self.project_path, 1)[-1].split("/", 2)[
+                        -1
+                    ]  # ensure that your project path value does not end with a /
+                    if self.project_path in result.file_path
+                    else result.file_path
+                ),
+                "content": result.content,
+                "match_type": self._determine_match_type(result, query_words),
+                "relevance": result.relevance,
+            }
+            for result in results
+        ]
 
-    def _determine_match_type(self, result: SearchIndex, query_words: List[str]) -> str:
-        if all(word in result.content.lower() for word in query_words):
+    def _determine_match_type(self, result, query_words: List[str]) -> str:
+        content = (result.content or "").lower()
+        if all(word in content for word in query_words):
             return "Exact Match"
         return "Partial Match"
 
-    def _string_similarity(self, a: str, b: str) -> float:
-        # Simple string similarity calculation
-        a = a.lower()
-        b = b.lower()
-        return len(set(a) & set(b)) / float(len(set(a) | set(b)))
-
     def delete_project_index(self, project_id: str):
         # Delete all search index entries for the given project_id
         delete_stmt = delete(SearchIndex).where(SearchIndex.project_id == project_id)
         self.db.execute(delete_stmt)
         self.db.commit()
 
-    async def bulk_create_search_indices(self, nodes: List[Dict]):
-        # Create index entries for all nodes in bulk
-        self.db.bulk_insert_mappings(SearchIndex, nodes)
+    def delete_node_indices(self, project_id: str, node_ids: List[str]):
+        # Delete the search index entries of specific nodes of a project
+        if not node_ids:
+            return
+        delete_stmt = delete(SearchIndex).where(
+            SearchIndex.project_id == project_id, SearchIndex.node_id.in_(node_ids)
+        )
+        self.db.execute(delete_stmt)
+        self.db.commit()
 
-    async def clone_search_indices(self, input_project_id: str, output_project_id: str):
-        """Clone all search indices from input project to output project."""
-        # Query all search indices for the input project
-        source_indices = (
-            self.db.query(SearchIndex)
-            .filter(SearchIndex.project_id == input_project_id)
-            .all()
+    def replace_node_indices(self, project_id: str, nodes: List[Dict]):
+        # Rewrite the search index entries of nodes whose name or path changed
+        if not nodes:
+            return
+        self.db.execute(
+            delete(SearchIndex).where(
+                SearchIndex.project_id == project_id,
+                SearchIndex.node_id.in_([node["node_id"] for node in nodes]),
+            )
         )
+        self.db.execute(
+            insert(SearchIndex),
+            [
+                {column: node.get(column) for column in SEARCH_INDEX_COPY_COLUMNS}
+                for node in nodes
+            ],
+        )
+        self.db.commit()
 
-        # Prepare bulk insert data
-        cloned_indices = [
-            {
-                "project_id": output_project_id,
-                "node_id": index.node_id,
-                "name": index.name,
-                "file_path": index.file_path,
-                "content": index.content,
-            }
-            for index in source_indices
-        ]
+    async def bulk_create_search_indices(self, nodes: Iterable[Dict]) -> int:
+        """
+        Stream index entries into search_indices with COPY, in chunks of
+        SEARCH_INDEX_COPY_CHUNK_ROWS rows, within the session's transaction.
+        Nodes may be a generator, only one chunk is held in memory. Returns
+        the number of entries written.
+        """
+        cursor = self.db.connection().connection.cursor()
+        copy_statement = (
+            f"COPY {SearchIndex.__tablename__} ({', '.join(SEARCH_INDEX_COPY_COLUMNS)}) "
+            "FROM STDIN"
+        )
+        count = 0
+        try:
+            for chunk, rows in self._copy_chunks(nodes):
+                cursor.copy_expert(copy_statement, chunk)
+                count += rows
+        finally:
+            cursor.close()
+        return count
+
+    @staticmethod
+    def _copy_chunks(nodes: Iterable[Dict]) -> Iterator[Tuple[io.StringIO, int]]:
+        chunk = io.StringIO()
+        rows = 0
+        for node in nodes:
+            chunk.write(
+                "\t".join(
+                    _copy_value(node.get(column))
+                    for column in SEARCH_INDEX_COPY_COLUMNS
+                )
+            )
+            chunk.write("\n")
+            rows += 1
+            if rows == SEARCH_INDEX_COPY_CHUNK_ROWS:
+                chunk.seek(0)
+                yield chunk, rows
+                chunk = io.StringIO()
+                rows = 0
+        if rows:
+            chunk.seek(0)
+            yield chunk, rows
 
-        # Bulk insert the cloned indices if there are any
-        if cloned_indices:
-            self.db.bulk_insert_mappings(SearchIndex, cloned_indices)
-            await self.commit_indices()
+    async def clone_search_indices(self, input_project_id: str, output_project_id: str):
+        """Clone all search indices from input project to output project."""
+        # Copied inside Postgres, the indexed content never reaches Python
+        self.db.execute(
+            insert(SearchIndex).from_select(
+                SEARCH_INDEX_COPY_COLUMNS,
+                select(
+                    literal(output_project_id),
+                    SearchIndex.node_id,
+                    SearchIndex.name,
+                    SearchIndex.file_path,
+                    SearchIndex.content,
+                ).where(SearchIndex.project_id == input_project_id),
+            )
+        )
+        await self.commit_indices()
+
+
+def _copy_value(value) -> str:
+    """Escape a value for the text format of COPY."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\x00", "")
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
@@ -0,0 +1,172 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.modules.parsing.graph_construction.code_graph_service import (
+    CodeGraphService,
+)
+from app.modules.projects.projects_model import Project
+from app.modules.search.search_models import SearchIndex
+
+# Projects whose symbol index is kept in memory by each process
+SYMBOL_INDEX_CACHE_SIZE = int(os.getenv("SYMBOL_INDEX_CACHE_SIZE", 32))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Weight of a token of the symbol name against one of its file path
+NAME_TOKEN_WEIGHT = 3
+FILE_PATH_TOKEN_WEIGHT = 1
+
+# Words of an identifier: acronyms, capitalized or lower case words and numbers,
+# so HTTPRequestHandler2 gives http, request, handler, 2
+IDENTIFIER_WORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize_identifier(text: str) -> List[str]:
+    """
+    Split identifiers, qualified names and paths into lower case words, e.g.
+    src/user_service.py:UserService.getUser gives src, user, service, py, user,
+    service, get, user.
+    """
+    return [word.lower() for word in IDENTIFIER_WORD_PATTERN.findall(text)]
+
+
+def split_qualified_name(identifier: str) -> Tuple[str, str]:
+    """Split rel_path:Class.method into the file path and the symbol name."""
+    file_path, _, symbol = identifier.strip().rpartition(":")
+    return file_path, symbol.rsplit(".", 1)[-1]
+
+
+class SymbolIndex:
+    """
+    Code symbols of a project for resolving identifiers to node ids.
+
+    A qualified name rel_path:Class.method or rel_path:function resolves in
+    constant time, node ids are derived from it the same way as in the graph.
+    Names that are not exact, such as a method given without its class or a
+    partial path, are ranked with BM25 over the words of the symbol names and
+    paths, split on case changes, underscores and path separators. A ranked
+    symbol only resolves when it shares a word of its name with the identifier.
+
+    The index of a project is built from its search indices on first use and
+    rebuilt once they change.
+    """
+
+    _indexes: "OrderedDict[str, Tuple[Tuple[int, int], SymbolIndex]]" = OrderedDict()
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, owner_id: str, symbols: List[Tuple[str, str, str]]):
+        self.owner_id = owner_id
+        self.node_ids = set()
+        self.by_location: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        self.name_tokens: Dict[str, set] = {}
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.documents: List[str] = []
+        lengths = []
+        for node_id, name, file_path in symbols:
+            if node_id in self.node_ids:
+                continue
+            self.node_ids.add(node_id)
+            self.by_location[(file_path, name)].append(node_id)
+            self.name_tokens[node_id] = set(tokenize_identifier(name))
+            frequencies = Counter()
+            for token in tokenize_identifier(name):
+                frequencies[token] += NAME_TOKEN_WEIGHT
+            for token in tokenize_identifier(file_path):
+                frequencies[token] += FILE_PATH_TOKEN_WEIGHT
+            for token, frequency in frequencies.items():
+                self.postings[token].append((len(self.documents), frequency))
+            self.documents.append(node_id)
+            lengths.append(sum(frequencies.values()))
+        self.lengths = lengths
+        self.average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def for_project(cls, db: Session, project_id: str) -> "SymbolIndex":
+        # Search indices are only inserted and deleted, ids are never reused
+        version = tuple(
+            db.execute(
+                select(func.count(SearchIndex.id), func.max(SearchIndex.id)).where(
+                    SearchIndex.project_id == project_id
+                )
+            ).one()
+        )
+        with cls._indexes_lock:
+            cached = cls._indexes.get(project_id)
+            if cached and cached[0] == version:
+                cls._indexes.move_to_end(project_id)
+                return cached[1]
+
+        owner_id = db.execute(
+            select(Project.user_id).where(Project.id == project_id)
+        ).scalar()
+        symbols = db.execute(
+            select(SearchIndex.node_id, SearchIndex.name, SearchIndex.file_path).where(
+                SearchIndex.project_id == project_id
+            )
+        ).all()
+        index = cls(owner_id, [tuple(symbol) for symbol in symbols])
+
+        with cls._indexes_lock:
+            cls._indexes[project_id] = (version, index)
+            cls._indexes.move_to_end(project_id)
+            while len(cls._indexes) > SYMBOL_INDEX_CACHE_SIZE:
+                cls._indexes.popitem(last=False)
+        return index
+
+    def resolve(self, identifier: str) -> Optional[str]:
+        """Node id of the symbol an identifier most likely names, if any."""
+        node_id = CodeGraphService.generate_node_id(identifier.strip(), self.owner_id)
+        if node_id in self.node_ids:
+            return node_id
+
+        file_path, name = split_qualified_name(identifier)
+        candidates = self.by_location.get((file_path, name), [])
+        if len(candidates) == 1:
+            return candidates[0]
+
+        # Path words such as src or py match almost every symbol, so a ranked
+        # hit only counts when its name shares a word with the identifier's
+        query_name_tokens = set(tokenize_identifier(name))
+        for node_id, _ in self.search(identifier, node_ids=candidates or None):
+            if self.name_tokens[node_id] & query_name_tokens:
+                return node_id
+        return None
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        node_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """BM25 ranking of the symbols, optionally only among node_ids."""
+        allowed = set(node_ids) if node_ids is not None else None
+        scores: Dict[int, float] = defaultdict(float)
+        document_count = len(self.documents)
+        for token in set(tokenize_identifier(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for document, frequency in postings:
+                if allowed is not None and self.documents[document] not in allowed:
+                    continue
+                length_ratio = self.lengths[document] / self.average_length
+                scores[document] += (
+                    idf
+                    * frequency
+                    * (BM25_K1 + 1)
+                    / (frequency + BM25_K1 * (1 - BM25_B + BM25_B * length_ratio))
+                )
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.documents[document], score) for document, score in ranked[:limit]]
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+from redis import Redis
+
+from app.core.config_provider import config_provider
+
+logger = logging.getLogger(__name__)
+
+# Entries written to a disk tier by a process between two checks of its size
+DISK_CACHE_EVICT_EVERY = int(os.getenv("DISK_CACHE_EVICT_EVERY", 1000))
+
+
+def encode_entry(value: Any) -> bytes:
+    """Serialize a cache entry as compressed JSON."""
+    return zlib.compress(json.dumps(value).encode("utf-8"))
+
+
+def decode_entry(payload: bytes, name: str) -> Optional[Any]:
+    try:
+        return json.loads(zlib.decompress(payload).decode("utf-8"))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable {name} cache entry: {e}")
+        return None
+
+
+class RedisTier:
+    """Entries of a cache kept in Redis for ttl seconds. Failures are logged, not raised."""
+
+    # One client for every cache of the process
+    _redis: Optional[Redis] = None
+
+    def __init__(self, name: str, ttl: int):
+        self.name = name
+        self.ttl = ttl
+
+    @classmethod
+    def get_client(cls) -> Redis:
+        if cls._redis is None:
+            cls._redis = Redis.from_url(config_provider.get_redis_url())
+        return cls._redis
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.get_client().get(key)
+        except Exception as e:
+            logger.warning(f"{self.name} cache Redis lookup failed for {key}: {e}")
+            return None
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        try:
+            return self.get_client().mget(keys)
+        except Exception as e:
+            logger.warning(f"{self.name} cache Redis lookup failed: {e}")
+            return [None] * len(keys)
+
+    def set_many(self, payloads: Dict[str, bytes]):
+        try:
+            pipeline = self.get_client().pipeline(transaction=False)
+            for key, payload in payloads.items():
+                pipeline.setex(key, self.ttl, payload)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(
+                f"{self.name} cache Redis write failed for {len(payloads)} entries: {e}"
+            )
+
+
+class DiskTier:
+    """
+    Entries of a cache stored as one file per key under cache_dir.
+
+    Files are written atomically, so the directory can be shared by processes.
+    Reads refresh the modification time of an entry, and every
+    DISK_CACHE_EVICT_EVERY writes the oldest entries are removed until the
+    directory fits in max_bytes. The tier is disabled, with cache_dir set to
+    None, when no directory is given or it cannot be created.
+    """
+
+    # Writes of this process per directory since its size was last checked
+    _writes: Dict[str, int] = {}
+    _writes_lock = threading.Lock()
+
+    def __init__(self, name: str, cache_dir: Optional[str], max_bytes: int):
+        self.name = name
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(
+                    f"{name} disk cache disabled, cannot create {self.cache_dir}: {e}"
+                )
+                self.cache_dir = None
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json.z")
+
+    def read(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            os.utime(path)
+            return payload
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"{self.name} cache disk read failed for {key}: {e}")
+            return None
+
+    def write(self, key: str, payload: bytes):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"{self.name} cache disk write failed for {key}: {e}")
+            return
+
+        with DiskTier._writes_lock:
+            writes = DiskTier._writes.get(self.cache_dir, 0) + 1
+            if writes < DISK_CACHE_EVICT_EVERY:
+                DiskTier._writes[self.cache_dir] = writes
+                return
+            DiskTier._writes[self.cache_dir] = 0
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the tier fits in max_bytes."""
+        entries = []
+        total = 0
+        try:
+            for bucket in os.scandir(self.cache_dir):
+                if not bucket.is_dir():
+                    continue
+                for entry in os.scandir(bucket.path):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError as e:
+            logger.warning(
+                f"{self.name} cache disk scan of {self.cache_dir} failed: {e}"
+            )
+            return
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"{self.name} cache disk eviction of {path} failed: {e}")
+                continue
+            total -= size
+            removed += 1
+        logger.info(
+            f"Evicted {removed} {self.name} cache entries from {self.cache_dir}"
+        )